@@ -0,0 +1,149 @@
+"""
+Vectorized ledger analytics (pandas/NumPy)
+
+Columns are loaded from the ledger tables with chunked `read_sql` into columnar
+DataFrames, and every metric is computed with group-bys / array operations
+instead of looping over ORM objects.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from database import read_engine, Transaction, VICIssuance, VICShares, ShareAccessDailyStats
+
+CHUNK_SIZE = 100_000
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+# Columns loaded per table; string columns with few distinct values become categoricals
+LEDGER_COLUMNS = {
+    'transactions': (
+        [Transaction.block_id, Transaction.transaction_type, Transaction.hospital, Transaction.timestamp],
+        ['transaction_type', 'hospital']
+    ),
+    'vic_issuances': (
+        [VICIssuance.transaction_hash, VICIssuance.hospital, VICIssuance.diagnosis, VICIssuance.timestamp],
+        ['hospital', 'diagnosis']
+    ),
+    'vic_shares': (
+        [VICShares.share_token, VICShares.original_transaction_hash, VICShares.is_active, VICShares.created_at],
+        []
+    ),
+    # Share accesses come from the daily rollups (raw access logs may be pruned): one row per
+    # share/day/hospital with its access count and first access, which is all the metrics need
+    'share_access_daily': (
+        [ShareAccessDailyStats.share_token, ShareAccessDailyStats.accessed_by_hospital,
+         ShareAccessDailyStats.first_accessed.label('created_at'), ShareAccessDailyStats.accesses],
+        ['accessed_by_hospital']
+    ),
+}
+
+def read_columns(columns, categorical=(), bind=None, chunksize=CHUNK_SIZE):
+    """Stream the given columns into a DataFrame, chunk by chunk"""
+    names = [column.key for column in columns]
+    frames = []
+    with (bind or read_engine).connect() as conn:
+        conn = conn.execution_options(stream_results=True)
+        for chunk in pd.read_sql(select(*columns), conn, chunksize=chunksize):
+            for name in categorical:
+                chunk[name] = chunk[name].astype('category')
+            frames.append(chunk)
+    if not frames:
+        return pd.DataFrame({name: pd.Series(dtype='object') for name in names})
+    frame = pd.concat(frames, ignore_index=True)
+    for name in categorical:
+        # Concatenating chunks with different categories falls back to object dtype
+        frame[name] = frame[name].astype('category')
+    return frame
+
+def load_ledger_frames(bind=None, chunksize=CHUNK_SIZE):
+    """Load the analytics columns of every ledger table"""
+    return {
+        table: read_columns(columns, categorical, bind=bind, chunksize=chunksize)
+        for table, (columns, categorical) in LEDGER_COLUMNS.items()
+    }
+
+def _epoch_seconds(values):
+    """Convert a datetime column (naive UTC) to float epoch seconds"""
+    values = pd.to_datetime(values)
+    return ((values - pd.Timestamp('1970-01-01')) / pd.Timedelta(seconds=1)).to_numpy(dtype='float64')
+
+def _percentiles(values):
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {f"p{p}": None for p in LATENCY_PERCENTILES}
+    result = np.percentile(values, LATENCY_PERCENTILES)
+    return {f"p{p}": round(float(v), 3) for p, v in zip(LATENCY_PERCENTILES, result)}
+
+def issuance_counts_by_hospital(vic_issuances):
+    """Number of VICs issued per hospital"""
+    counts = vic_issuances.groupby('hospital', observed=True).size().sort_values(ascending=False)
+    return {str(k): int(v) for k, v in counts.items()}
+
+def diagnosis_frequency(vic_issuances, top=20):
+    """Most frequent diagnoses (case and whitespace insensitive)"""
+    # Count raw values first, then normalize only the distinct labels
+    counts = vic_issuances['diagnosis'].value_counts()
+    counts.index = counts.index.astype(str).str.strip().str.lower()
+    counts = counts.groupby(level=0).sum().sort_values(ascending=False).head(top)
+    return {str(k): int(v) for k, v in counts.items() if v}
+
+def share_access_funnel(vic_issuances, vic_shares, share_access_daily):
+    """Issued -> shared -> accessed funnel"""
+    issued = int(len(vic_issuances))
+    shared_hashes = vic_shares['original_transaction_hash'].unique()
+    shared = int(vic_issuances['transaction_hash'].isin(shared_hashes).sum())
+    accessed_mask = vic_shares['share_token'].isin(share_access_daily['share_token'].unique())
+    accessed = int(vic_shares.loc[accessed_mask, 'original_transaction_hash'].nunique())
+    return {
+        'issued': issued,
+        'shared': shared,
+        'accessed': accessed,
+        'shares_created': int(len(vic_shares)),
+        'shares_accessed': int(accessed_mask.sum()),
+        'share_accesses': int(share_access_daily['accesses'].sum()),
+        'share_rate': round(shared / issued, 4) if issued else 0.0,
+        'access_rate': round(accessed / shared, 4) if shared else 0.0
+    }
+
+def latency_percentiles(vic_issuances, vic_shares, share_access_daily):
+    """Seconds from issuance to first share, and from share creation to first access"""
+    first_share = (
+        vic_shares.assign(shared_at=_epoch_seconds(vic_shares['created_at']))
+        .groupby('original_transaction_hash')['shared_at'].min()
+    )
+    issued_at = vic_issuances.set_index('transaction_hash')['timestamp']
+    issue_to_share = (first_share - issued_at.reindex(first_share.index)).to_numpy(dtype='float64')
+
+    first_access = (
+        share_access_daily.assign(accessed_at=_epoch_seconds(share_access_daily['created_at']))
+        .groupby('share_token')['accessed_at'].min()
+    )
+    created_at = pd.Series(_epoch_seconds(vic_shares['created_at']), index=vic_shares['share_token'])
+    share_to_access = (first_access - created_at.reindex(first_access.index)).to_numpy(dtype='float64')
+
+    return {
+        'issue_to_first_share': _percentiles(issue_to_share),
+        'share_to_first_access': _percentiles(share_to_access)
+    }
+
+def transaction_type_counts(transactions):
+    """Number of transactions per transaction type"""
+    counts = transactions.groupby('transaction_type', observed=True).size()
+    return {str(k): int(v) for k, v in counts.items()}
+
+def compute_ledger_analytics(frames, top_diagnoses=20):
+    """Compute every ledger metric from pre-loaded frames"""
+    vic_issuances = frames['vic_issuances']
+    vic_shares = frames['vic_shares']
+    share_access_daily = frames['share_access_daily']
+    return {
+        'rows': {table: int(len(frame)) for table, frame in frames.items()},
+        'transaction_types': transaction_type_counts(frames['transactions']),
+        'issuances_by_hospital': issuance_counts_by_hospital(vic_issuances),
+        'diagnosis_frequency': diagnosis_frequency(vic_issuances, top=top_diagnoses),
+        'share_access_funnel': share_access_funnel(vic_issuances, vic_shares, share_access_daily),
+        'latency_seconds': latency_percentiles(vic_issuances, vic_shares, share_access_daily)
+    }
+
+def get_ledger_analytics(bind=None, top_diagnoses=20, chunksize=CHUNK_SIZE):
+    """Load the ledger columns and compute every metric"""
+    return compute_ledger_analytics(load_ledger_frames(bind=bind, chunksize=chunksize), top_diagnoses=top_diagnoses)
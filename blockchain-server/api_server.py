@@ -1,19 +1,38 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import json
 import hashlib
+import os
 import time
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
 from database import (
-    create_tables, get_db, save_transaction, save_vic_issuance,
-    get_all_transactions, get_all_vic_issuances, get_all_blocks,
-    create_vic_share, get_vic_share_by_token, get_vic_shares_by_patient,
-    revoke_vic_share, log_vic_access, update_vic_share_last_accessed,
-    get_vic_access_logs
+    SessionLocal, create_tables, get_db, get_read_db,
+    create_vic_share, create_vic_shares, get_vic_share_by_token, revoke_vic_share, revoke_vic_shares,
+    log_vic_access, update_vic_share_last_accessed,
+    get_block_by_index, get_ledger_counts, ANALYTICS_COMMIT_LAG,
+    list_transactions, list_vic_issuances, get_vic_issuance_row, list_vic_shares_by_patient, list_vic_access_logs,
+    list_share_access_daily, share_page_cursor, parse_share_page_cursor, SHARE_ACTIVE, SHARE_EXPIRED, SHARE_REVOKED,
+    encode_medical_data, encode_permissions, decode_permissions, encode_accessed_data, decode_accessed_data,
+    shared_vic_data
 )
+from sqlalchemy.exc import IntegrityError
+from verify_service import verify_transaction
+from mempool import Mempool, BlockProducer, REQUIRED_VIC_FIELDS, get_transaction_status
+from sequencer import BlockSequencer, SequencerBusy
+from group_commit import GroupCommitter
+from maintenance import MaintenanceWorker
+from block_log import block_log
+from block_index import block_index
+from events import event_bus, event_matcher, format_sse, parse_event_types, SSE_HEARTBEAT
+from fast_json import FastJSONResponse, projection
 
-app = FastAPI()
+# List endpoints return FastJSONResponse themselves (no jsonable_encoder pass); the rest still benefit from orjson
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -27,85 +46,132 @@ app.add_middleware(
 # Create database tables
 create_tables()
 
+# Mempool dan block producer (seal by size or time interval)
+MAX_CONFIRMATION_WAIT = 60.0
+# GROUP_COMMIT_ENABLED: concurrent issuances share one DB commit (see group_commit.py)
+GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "false").lower() == "true"
+mempool = Mempool(committer=GroupCommitter() if GROUP_COMMIT_ENABLED else None)
+block_producer = BlockProducer(mempool)
+
+def publish_sealed_block(block):
+    """Feed sealed blocks from the producer thread into the event bus"""
+    event_bus.publish(
+        'block.sealed',
+        block_number=block['block_number'],
+        hash=block['hash'],
+        previous_hash=block['previous_hash'],
+        timestamp=block['timestamp'],
+        transaction_count=len(block['transactions'])
+    )
+    for tx in block['transactions']:
+        event_bus.publish('transaction.confirmed', block_number=block['block_number'], **tx)
+
+BLOCK_STORES = [store for store in (block_log, block_index) if store is not None]
+
+def sync_block_stores(block=None):
+    """Copy newly sealed blocks into the block log / mmap block index"""
+    db = SessionLocal()
+    try:
+        for store in BLOCK_STORES:
+            store.sync_from_database(db)
+    finally:
+        db.close()
+
+block_producer.listeners.append(publish_sealed_block)
+if BLOCK_STORES:
+    block_producer.listeners.append(sync_block_stores)
+
+# Optional single-writer sequencer: issuances are sealed synchronously, many per block
+SEQUENCER_ENABLED = os.getenv("SEQUENCER_ENABLED", "false").lower() == "true"
+sequencer = BlockSequencer() if SEQUENCER_ENABLED else None
+if sequencer is not None:
+    sequencer.listeners.append(publish_sealed_block)
+    if BLOCK_STORES:
+        sequencer.listeners.append(sync_block_stores)
+
+# Access log partitions and retention (see maintenance.py)
+maintenance = MaintenanceWorker()
+
+@app.on_event("startup")
+def start_maintenance():
+    if os.getenv("MAINTENANCE_ENABLED", "true").lower() == "true":
+        maintenance.start()
+
+@app.on_event("shutdown")
+def stop_maintenance():
+    maintenance.stop()
+
+@app.on_event("startup")
+def catch_up_block_stores():
+    if BLOCK_STORES:
+        sync_block_stores()
+
+@app.on_event("startup")
+def start_block_producer():
+    if os.getenv("BLOCK_PRODUCER_ENABLED", "true").lower() == "true":
+        block_producer.start()
+
+@app.on_event("startup")
+async def start_sequencer():
+    if sequencer is not None:
+        sequencer.start()
+
+@app.on_event("shutdown")
+def stop_block_producer():
+    block_producer.stop()
+    if mempool.committer is not None:
+        mempool.committer.stop()
+
+@app.on_event("shutdown")
+async def stop_sequencer():
+    if sequencer is not None:
+        await sequencer.stop()
+
+def refresh_analytics(block=None):
+    """Ask the maintenance thread to fold new rows into the analytics aggregates (off the request path),
+    once they are older than the fold's commit lag"""
+    maintenance.request('analytics', delay=ANALYTICS_COMMIT_LAG + 1)
+
+block_producer.listeners.append(refresh_analytics)
+
 @app.get("/")
 async def root():
     return {"message": "DID Blockchain API Server", "status": "running"}
 
 @app.get("/verify/{transaction_hash}")
-async def verify_vic(transaction_hash: str, db: Session = Depends(get_db)):
+def verify_vic(transaction_hash: str, db: Session = Depends(get_read_db)):
     """Verify VIC using transaction hash"""
-    try:
-        # Search for VIC issuance with this transaction hash
-        vic_issuances = get_all_vic_issuances(db)
-        
-        for vic in vic_issuances:
-            if vic.transaction_hash == transaction_hash:
-                return {
-                    "verified": True,
-                    "message": "VIC verified successfully",
-                    "data": {
-                        "transaction_hash": vic.transaction_hash,
-                        "block_number": vic.block_number,
-                        "hospital": vic.hospital,
-                        "patient_id": vic.patient_id,
-                        "patient_name": vic.patient_name,
-                        "diagnosis": vic.diagnosis,
-                        "treatment": vic.treatment,
-                        "doctor": vic.doctor,
-                        "date": vic.date,
-                        "notes": vic.notes,
-                        "timestamp": vic.timestamp
-                    }
-                }
-        
-        return {
-            "verified": False,
-            "message": "VIC not found in blockchain",
-            "data": None
-        }
-        
-    except Exception as e:
-        return {
-            "verified": False,
-            "message": f"Verification error: {str(e)}",
-            "data": None
-        }
+    return verify_transaction(db, transaction_hash)
 
 @app.post("/api/issue-vic")
-async def issue_vic(data: Dict[str, Any], db: Session = Depends(get_db)):
+async def issue_vic(data: Dict[str, Any], db: Session = Depends(get_db),
+                    idempotency_key: Optional[str] = Header(None)):
+    """Queue a VIC issuance in the mempool; the block producer seals it into a block
+    (with SEQUENCER_ENABLED the request waits for its block and returns it)
+
+    Requests repeating an Idempotency-Key return the original transaction instead of a new one.
+    """
     try:
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+            return {
+                'success': False,
+                'error': "Idempotency-Key must be 1-255 characters"
+            }
+        missing = [field for field in REQUIRED_VIC_FIELDS if field not in data['medical_data']]
+        if missing:
+            return {
+                'success': False,
+                'error': f"Missing medical_data fields: {', '.join(missing)}"
+            }
+        
         # Generate transaction hash with timestamp to ensure uniqueness
-        import time
         timestamp = time.time()
         transaction_data = json.dumps(data, sort_keys=True).encode()
         unique_data = transaction_data + str(timestamp).encode()
         transaction_hash = '0x' + hashlib.sha256(unique_data).hexdigest()[:40]
         
-        # Get current blocks and create new block
-        blocks = get_all_blocks(db)
-        block_number = len(blocks) + 1
-        
-        # Create new block for this transaction
-        from database import Block
-        previous_hash = blocks[-1].hash if blocks else "0"
-        block_hash = hashlib.sha256(f"{block_number}{timestamp}{previous_hash}".encode()).hexdigest()
-        
-        new_block = Block(
-            index=block_number,
-            timestamp=timestamp,
-            previous_hash=previous_hash,
-            hash=block_hash,
-            nonce=0
-        )
-        
-        # Save block to database
-        db.add(new_block)
-        db.commit()
-        db.refresh(new_block)  # Get the ID after commit
-        
-        # Create transaction data
+        # Create pending transaction data
         transaction = {
-            'block_id': new_block.id,
             'transaction_hash': transaction_hash,
             'from_address': None,
             'to_address': data['patient_id'],
@@ -113,34 +179,35 @@ async def issue_vic(data: Dict[str, Any], db: Session = Depends(get_db)):
             'transaction_type': 'vic_issuance',
             'hospital': data['hospital'],
             'patient_id': data['patient_id'],
-            'medical_data': json.dumps(data['medical_data']),
+            'medical_data': encode_medical_data(data['medical_data']),
             'timestamp': timestamp
         }
         
-        # Save transaction to database
-        saved_transaction = save_transaction(db, transaction)
-        
-        # Save VIC issuance details
-        vic_data = {
-            'transaction_hash': transaction_hash,
-            'block_number': block_number,
-            'hospital': data['hospital'],
-            'patient_id': data['patient_id'],
-            'patient_name': data['medical_data']['patient_name'],
-            'diagnosis': data['medical_data']['diagnosis'],
-            'treatment': data['medical_data']['treatment'],
-            'doctor': data['medical_data']['doctor'],
-            'date': data['medical_data']['date'],
-            'notes': data['medical_data'].get('notes', ''),
-            'timestamp': timestamp
-        }
+        if sequencer is not None:
+            return await issue_through_sequencer(db, data, transaction, idempotency_key)
         
-        saved_vic = save_vic_issuance(db, vic_data)
+        # Save to mempool; VIC issuance details are written when the block is sealed
+        # Off the event loop, so other requests can join the same group commit meanwhile
+        if idempotency_key:
+            transaction_hash, created = await run_in_threadpool(mempool.submit_once, db, transaction, idempotency_key)
+            if not created:
+                return await run_in_threadpool(replayed_issuance, db, data, transaction_hash)
+        else:
+            await run_in_threadpool(mempool.submit, db, transaction)
+        event_bus.publish(
+            'transaction.pending',
+            transaction_hash=transaction_hash,
+            transaction_type='vic_issuance',
+            hospital=data['hospital'],
+            patient_id=data['patient_id']
+        )
+        refresh_analytics()
         
         return {
             'success': True,
             'transactionHash': transaction_hash,
-            'blockNumber': block_number,
+            'status': 'pending',
+            'blockNumber': None,
             'patientId': data['patient_id']
         }
         
@@ -150,88 +217,343 @@ async def issue_vic(data: Dict[str, Any], db: Session = Depends(get_db)):
             'error': str(e)
         }
 
+def replayed_issuance(db: Session, data, transaction_hash):
+    """Response for a retry of an earlier request: the original transaction"""
+    status = get_transaction_status(db, transaction_hash)
+    return {
+        'success': True,
+        'transactionHash': transaction_hash,
+        'status': status['status'],
+        'blockNumber': status['block_number'],
+        'patientId': data['patient_id'],
+        'replayed': True
+    }
+
+async def issue_through_sequencer(db: Session, data, transaction, idempotency_key):
+    """Seal the issuance via the sequencer and answer once its block is committed"""
+    if idempotency_key:
+        existing = await run_in_threadpool(mempool.known_transaction_hash, db, idempotency_key)
+        if existing:
+            return await run_in_threadpool(replayed_issuance, db, data, existing)
+    try:
+        block = await sequencer.submit(transaction, idempotency_key)
+    except SequencerBusy as e:
+        return JSONResponse(status_code=503, headers={'Retry-After': '1'}, content={'success': False, 'error': str(e)})
+    except IntegrityError:
+        # A concurrent request with the same key won
+        await run_in_threadpool(db.rollback)
+        existing = idempotency_key and await run_in_threadpool(mempool.known_transaction_hash, db, idempotency_key)
+        if not existing:
+            raise
+        return await run_in_threadpool(replayed_issuance, db, data, existing)
+    if idempotency_key:
+        mempool.recent_keys.put(idempotency_key, transaction['transaction_hash'])
+    refresh_analytics()
+    return {
+        'success': True,
+        'transactionHash': transaction['transaction_hash'],
+        'status': 'confirmed',
+        'blockNumber': block['block_number'],
+        'patientId': data['patient_id']
+    }
+
+# Confirmation wait (long-poll / SSE) backed by the in-process event bus
+CONFIRMATION_DB_RECHECK = 5.0  # Seconds; catches blocks sealed by other processes
+SSE_HEARTBEAT_INTERVAL = 15.0
+
+def lookup_transaction_status(transaction_hash):
+    db = SessionLocal()
+    try:
+        return get_transaction_status(db, transaction_hash)
+    finally:
+        db.close()
+
+async def wait_for_confirmation(transaction_hash=None, patient_id=None, timeout=30.0, since=None):
+    """Next transaction.confirmed event for a hash or patient; None on timeout"""
+    subscription = event_bus.subscribe(
+        event_matcher({'transaction.confirmed'}, transaction_hash, patient_id), since=since
+    )
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            if transaction_hash:
+                # Subscribed first, so a block sealed during this lookup is not missed
+                status = await run_in_threadpool(lookup_transaction_status, transaction_hash)
+                if status['status'] == 'confirmed':
+                    return {'type': 'transaction.confirmed', 'seq': None, **status}
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            event = await subscription.get(min(remaining, CONFIRMATION_DB_RECHECK) if transaction_hash else remaining)
+            if event is not None:
+                return event
+    finally:
+        subscription.close()
+
+@app.get("/api/transactions/{transaction_hash}/status")
+async def get_transaction_status_endpoint(transaction_hash: str, wait: float = 0):
+    """Transaction status; with wait > 0, block until confirmed or wait seconds pass"""
+    try:
+        if wait > 0:
+            event = await wait_for_confirmation(transaction_hash=transaction_hash, timeout=min(wait, MAX_CONFIRMATION_WAIT))
+            if event is not None:
+                return {'success': True, 'transaction_hash': transaction_hash, 'status': 'confirmed', 'block_number': event['block_number']}
+        status = await run_in_threadpool(lookup_transaction_status, transaction_hash)
+        return dict(status, success=True)
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@app.get("/api/confirmations/wait")
+async def wait_confirmation_endpoint(transaction_hash: str = None, patient_id: str = None, timeout: float = 30, since: int = None):
+    """Long-poll until a transaction (by hash or patient_id) is committed to a block"""
+    if not transaction_hash and not patient_id:
+        return {
+            'success': False,
+            'error': 'transaction_hash or patient_id is required'
+        }
+    try:
+        event = await wait_for_confirmation(transaction_hash, patient_id, min(timeout, MAX_CONFIRMATION_WAIT), since)
+        return {
+            'success': True,
+            'confirmed': event is not None,
+            'event': event,
+            'last_seq': event_bus.last_seq
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+def sse_response(request: Request, predicate, since=None, stop_after=None, initial_events=()):
+    """Stream matching bus events as SSE, resuming after `since` (or the Last-Event-ID header)"""
+    last_event_id = request.headers.get('last-event-id')
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    async def stream():
+        subscription = event_bus.subscribe(predicate, since=since)
+        try:
+            if since is not None:
+                oldest = event_bus.oldest_seq()
+                if oldest is not None and since + 1 < oldest:
+                    # Events were evicted from the replay buffer; the client must reload
+                    yield format_sse({'seq': since, 'type': 'events.reset', 'stream_id': event_bus.stream_id, 'oldest_seq': oldest})
+            for event in initial_events:
+                yield format_sse(event)
+                if stop_after and stop_after(event):
+                    return
+            while not await request.is_disconnected():
+                event = await subscription.get(SSE_HEARTBEAT_INTERVAL)
+                if event is None:
+                    if subscription.overflowed:
+                        return
+                    yield SSE_HEARTBEAT
+                    continue
+                yield format_sse(event)
+                if stop_after and stop_after(event):
+                    return
+        finally:
+            subscription.close()
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={'Cache-Control': 'no-cache'})
+
+@app.get("/api/confirmations/stream")
+async def stream_confirmations_endpoint(request: Request, transaction_hash: str = None, patient_id: str = None):
+    """Server-sent events: transaction.pending / transaction.confirmed for a hash or patient_id"""
+    initial_events = []
+    if transaction_hash:
+        status = await run_in_threadpool(lookup_transaction_status, transaction_hash)
+        if status['status'] == 'confirmed':
+            # Synthesized from the database, not the bus: no seq, so it never moves the client's Last-Event-ID
+            initial_events.append({'type': 'transaction.confirmed', **status})
+    
+    return sse_response(
+        request,
+        event_matcher({'transaction.pending', 'transaction.confirmed'}, transaction_hash, patient_id),
+        initial_events=initial_events,
+        stop_after=(lambda event: event['type'] == 'transaction.confirmed') if transaction_hash else None
+    )
+
+# Live ledger event feed (blocks, issuances, shares) with resume by sequence number
+@app.get("/api/events")
+async def get_events(since: int = 0, types: str = None, hospital: str = None, patient_id: str = None, limit: int = 500):
+    """Buffered events after `since`; poll with the returned last_seq"""
+    events, complete, last_seq = event_bus.events_since(
+        since, event_matcher(parse_event_types(types), patient_id=patient_id, hospital=hospital), min(limit, 5000)
+    )
+    return FastJSONResponse({
+        'success': True,
+        'stream_id': event_bus.stream_id,
+        'events': events,
+        'complete': complete,  # False: events were evicted, reload full state
+        'last_seq': last_seq
+    })
+
+@app.get("/api/events/stream")
+async def stream_events(request: Request, since: int = None, types: str = None, hospital: str = None, patient_id: str = None):
+    """Server-sent events for new blocks, issuances, share creations, revocations and accesses"""
+    return sse_response(request, event_matcher(parse_event_types(types), patient_id=patient_id, hospital=hospital), since=since)
+
+@app.get("/api/blocks/{index}")
+def get_block(index: int, db: Session = Depends(get_db)):
+    """Block with its transactions, served from the block log when enabled"""
+    block = block_log.get(index) if block_log is not None else None
+    if block is None:
+        block = get_block_by_index(db, index)
+    if block is None:
+        return {'success': False, 'error': 'Block not found'}
+    return {'success': True, 'block': block}
+
+@app.get("/api/blocks/{index}/header")
+def get_block_header(index: int):
+    """Block header from the memory-mapped block index"""
+    if block_index is None:
+        return {'success': False, 'error': 'Block index not enabled (set BLOCK_INDEX_DIR)'}
+    header = block_index.header(index)
+    if header is None:
+        return {'success': False, 'error': 'Block not found'}
+    return {'success': True, 'header': header}
+
+@app.get("/api/transactions/{transaction_hash}/proof")
+def get_inclusion_proof(transaction_hash: str, db: Session = Depends(get_db)):
+    """Block header and ordered transaction hashes proving a confirmed transaction's inclusion"""
+    if block_index is None:
+        return {'success': False, 'error': 'Block index not enabled (set BLOCK_INDEX_DIR)'}
+    status = get_transaction_status(db, transaction_hash)
+    if status['status'] != 'confirmed':
+        return {'success': False, 'error': f"Transaction is {status['status']}"}
+    proof = block_index.inclusion_proof(status['block_number'], transaction_hash)
+    if proof is None:
+        return {'success': False, 'error': 'Block not indexed yet'}
+    return {'success': True, 'proof': proof}
+
 @app.get("/api/health")
-async def health(db: Session = Depends(get_db)):
-    transactions = get_all_transactions(db)
-    vic_issuances = get_all_vic_issuances(db)
-    blocks = get_all_blocks(db)
+async def health(db: Session = Depends(get_read_db)):
+    counts = get_ledger_counts(db)
     
     return {
         "status": "healthy", 
-        "transactions": len(transactions),
-        "vic_issuances": len(vic_issuances),
-        "blocks": len(blocks)
+        "transactions": counts['transactions'],
+        "vic_issuances": counts['vic_issuances'],
+        "blocks": counts['blocks']
     }
 
+# Row -> response dict projections for the list endpoints (datetimes are serialized as ISO 8601)
+TRANSACTION_ROW = projection(
+    'id', 'transaction_hash', 'from_address', 'to_address', 'amount', 'transaction_type', 'hospital',
+    'patient_id', 'timestamp', 'created_at'
+)
+VIC_ISSUANCE_ROW = projection(
+    'id', 'transaction_hash', 'block_number', 'hospital', 'patient_id', 'patient_name', 'diagnosis',
+    'treatment', 'doctor', 'date', 'notes', 'timestamp', 'created_at'
+)
+VIC_SHARE_ROW = projection(
+    'id', 'share_token', 'original_transaction_hash', 'shared_by', 'shared_with_hospital',
+    ('access_permissions', lambda share: decode_permissions(share.access_permissions)),
+    'expires_at', 'is_active', 'status', 'created_at', 'last_accessed'
+)
+VIC_SUMMARY_ROW = projection(
+    ('transaction_hash', 'original_transaction_hash'), ('block_number', 'vic_block_number'),
+    ('hospital', 'vic_hospital'), ('patient_name', 'vic_patient_name'), ('diagnosis', 'vic_diagnosis'),
+    ('date', 'vic_date'), ('timestamp', 'vic_timestamp')
+)
+VIC_ACCESS_LOG_ROW = projection(
+    'id', 'accessed_by_hospital', 'accessed_data', 'ip_address', 'user_agent', 'created_at'
+)
+SHARE_ACCESS_DAY_ROW = projection(
+    ('date', lambda row: datetime.utcfromtimestamp(row.day).date()),
+    'accessed_by_hospital', 'accesses', 'first_accessed', 'last_accessed'
+)
+
 @app.get("/api/transactions")
-async def get_transactions(db: Session = Depends(get_db)):
-    transactions = get_all_transactions(db)
-    return {"transactions": [{
-        "id": t.id,
-        "transaction_hash": t.transaction_hash,
-        "from_address": t.from_address,
-        "to_address": t.to_address,
-        "amount": t.amount,
-        "transaction_type": t.transaction_type,
-        "hospital": t.hospital,
-        "patient_id": t.patient_id,
-        "timestamp": t.timestamp,
-        "created_at": t.created_at.isoformat()
-    } for t in transactions]}
+async def get_transactions(db: Session = Depends(get_read_db)):
+    transactions = list_transactions(db)
+    return FastJSONResponse({"transactions": list(map(TRANSACTION_ROW, transactions))})
 
 @app.get("/api/vic-issuances")
-async def get_vic_issuances(db: Session = Depends(get_db)):
-    vic_issuances = get_all_vic_issuances(db)
-    return {"vic_issuances": [{
-        "id": v.id,
-        "transaction_hash": v.transaction_hash,
-        "block_number": v.block_number,
-        "hospital": v.hospital,
-        "patient_id": v.patient_id,
-        "patient_name": v.patient_name,
-        "diagnosis": v.diagnosis,
-        "treatment": v.treatment,
-        "doctor": v.doctor,
-        "date": v.date,
-        "notes": v.notes,
-        "timestamp": v.timestamp,
-        "created_at": v.created_at.isoformat()
-    } for v in vic_issuances]}
+async def get_vic_issuances(db: Session = Depends(get_read_db)):
+    vic_issuances = list_vic_issuances(db)
+    return FastJSONResponse({"vic_issuances": list(map(VIC_ISSUANCE_ROW, vic_issuances))})
 
 # VIC Sharing Endpoints
+MAX_BULK_SHARES = 1000
+MAX_SHARE_PAGE = 200
+
+def bulk_list_error(data, field):
+    """Error message unless data[field] is a non-empty list of at most MAX_BULK_SHARES strings, else None"""
+    values = data.get(field)
+    if not isinstance(values, list) or not values or not all(isinstance(value, str) for value in values):
+        return f"{field} must be a non-empty list of strings"
+    if len(values) > MAX_BULK_SHARES:
+        return f"At most {MAX_BULK_SHARES} {field} per request"
+    return None
+
+def new_share_data(data, transaction_hash):
+    """Share row for a create request: fresh token, encoded permissions, expiry from expires_in_hours"""
+    import secrets
+    from datetime import timedelta
+    
+    # Parse expiration time
+    expires_at = None
+    if data.get('expires_in_hours'):
+        expires_at = datetime.utcnow() + timedelta(hours=data['expires_in_hours'])
+    
+    return {
+        'share_token': 'VIC_' + secrets.token_urlsafe(32),
+        'original_transaction_hash': transaction_hash,
+        'patient_id': data['patient_id'],
+        'shared_by': data['shared_by'],
+        'shared_with_hospital': data.get('shared_with_hospital'),
+        'access_permissions': encode_permissions(data.get('access_permissions', {
+            'diagnosis': True,
+            'treatment': True,
+            'doctor': True,
+            'date': True,
+            'notes': False
+        })),
+        'expires_at': expires_at,
+        'is_active': True
+    }
+
+def publish_share_created(share_data):
+    expires_at = share_data['expires_at']
+    event_bus.publish(
+        'share.created',
+        share_token=share_data['share_token'],
+        transaction_hash=share_data['original_transaction_hash'],
+        patient_id=share_data['patient_id'],
+        shared_with_hospital=share_data['shared_with_hospital'],
+        expires_at=expires_at.isoformat() if expires_at else None
+    )
+
+def publish_share_revoked(share):
+    """share.revoked with the same fields as share.created, so patient_id/hospital subscribers see it"""
+    event_bus.publish(
+        'share.revoked',
+        share_token=share.share_token,
+        transaction_hash=share.original_transaction_hash,
+        patient_id=share.patient_id,
+        shared_with_hospital=share.shared_with_hospital,
+        expires_at=share.expires_at.isoformat() if share.expires_at else None
+    )
+
 @app.post("/api/vic-share/create")
 async def create_vic_share_endpoint(data: Dict[str, Any], db: Session = Depends(get_db)):
     """Create a new VIC share"""
     try:
-        import secrets
-        from datetime import datetime, timedelta
-        
-        # Generate unique share token
-        share_token = 'VIC_' + secrets.token_urlsafe(32)
-        
-        # Parse expiration time
-        expires_at = None
-        if data.get('expires_in_hours'):
-            expires_at = datetime.utcnow() + timedelta(hours=data['expires_in_hours'])
-        
-        share_data = {
-            'share_token': share_token,
-            'original_transaction_hash': data['transaction_hash'],
-            'patient_id': data['patient_id'],
-            'shared_by': data['shared_by'],
-            'shared_with_hospital': data.get('shared_with_hospital'),
-            'access_permissions': json.dumps(data.get('access_permissions', {
-                'diagnosis': True,
-                'treatment': True,
-                'doctor': True,
-                'date': True,
-                'notes': False
-            })),
-            'expires_at': expires_at,
-            'is_active': True
-        }
+        share_data = new_share_data(data, data['transaction_hash'])
+        share_token, expires_at = share_data['share_token'], share_data['expires_at']
         
         share = create_vic_share(db, share_data)
+        publish_share_created(share_data)
+        refresh_analytics()
         
         return {
             'success': True,
@@ -246,6 +568,64 @@ async def create_vic_share_endpoint(data: Dict[str, Any], db: Session = Depends(
             'error': str(e)
         }
 
+@app.post("/api/vic-share/bulk-create")
+async def bulk_create_vic_shares_endpoint(data: Dict[str, Any], db: Session = Depends(get_db)):
+    """Share several VICs of one patient (same hospital, permissions and expiry) in one transaction"""
+    try:
+        error = bulk_list_error(data, 'transaction_hashes')
+        if error:
+            return {'success': False, 'error': error}
+        transaction_hashes = list(dict.fromkeys(data['transaction_hashes']))
+        
+        shares = [new_share_data(data, transaction_hash) for transaction_hash in transaction_hashes]
+        created = create_vic_shares(db, shares)
+        for share_data in shares:
+            publish_share_created(share_data)
+        refresh_analytics()
+        
+        expires_at = shares[0]['expires_at']
+        return {
+            'success': True,
+            'created': created,
+            'shares': [{
+                'transaction_hash': share_data['original_transaction_hash'],
+                'share_token': share_data['share_token']
+            } for share_data in shares],
+            'expires_at': expires_at.isoformat() if expires_at else None
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@app.post("/api/vic-share/bulk-revoke")
+async def bulk_revoke_vic_shares_endpoint(data: Dict[str, Any], db: Session = Depends(get_db)):
+    """Revoke shares by token list, by patient_id and/or by hospital (all given filters must match)"""
+    try:
+        share_tokens = data.get('share_tokens')
+        error = share_tokens is not None and bulk_list_error(data, 'share_tokens')
+        if error:
+            return {'success': False, 'error': error}
+        
+        revoked = revoke_vic_shares(db, share_tokens=share_tokens, patient_id=data.get('patient_id'),
+                                    hospital=data.get('hospital'))
+        for share in revoked:
+            publish_share_revoked(share)
+        
+        return {
+            'success': True,
+            'revoked': len(revoked),
+            'share_tokens': [share.share_token for share in revoked]
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
 @app.get("/api/vic-share/{share_token}")
 async def get_vic_share(share_token: str, hospital: str = None, db: Session = Depends(get_db)):
     """Get VIC data using share token"""
@@ -260,14 +640,14 @@ async def get_vic_share(share_token: str, hospital: str = None, db: Session = De
                 'error': 'Share token not found'
             }
         
-        if not share.is_active:
+        if share.status == SHARE_REVOKED or not share.is_active:
             return {
                 'success': False,
                 'error': 'Share token has been revoked'
             }
         
-        # Check expiration
-        if share.expires_at and share.expires_at < datetime.utcnow():
+        # Check expiration (the maintenance sweep marks it, but may not have run yet)
+        if share.status == SHARE_EXPIRED or (share.expires_at and share.expires_at <= datetime.utcnow()):
             return {
                 'success': False,
                 'error': 'Share token has expired'
@@ -281,12 +661,7 @@ async def get_vic_share(share_token: str, hospital: str = None, db: Session = De
             }
         
         # Get original VIC data
-        vic_issuances = get_all_vic_issuances(db)
-        original_vic = None
-        for vic in vic_issuances:
-            if vic.transaction_hash == share.original_transaction_hash:
-                original_vic = vic
-                break
+        original_vic = get_vic_issuance_row(db, share.original_transaction_hash)
         
         if not original_vic:
             return {
@@ -295,40 +670,30 @@ async def get_vic_share(share_token: str, hospital: str = None, db: Session = De
             }
         
         # Parse access permissions
-        permissions = json.loads(share.access_permissions) if share.access_permissions else {}
+        permissions = decode_permissions(share.access_permissions)
         
         # Filter data based on permissions
-        filtered_data = {
-            'transaction_hash': original_vic.transaction_hash,
-            'block_number': original_vic.block_number,
-            'hospital': original_vic.hospital,
-            'patient_id': original_vic.patient_id,
-            'patient_name': original_vic.patient_name,
-            'timestamp': original_vic.timestamp
-        }
+        filtered_data = shared_vic_data(original_vic, permissions)
         
-        if permissions.get('diagnosis', True):
-            filtered_data['diagnosis'] = original_vic.diagnosis
-        if permissions.get('treatment', True):
-            filtered_data['treatment'] = original_vic.treatment
-        if permissions.get('doctor', True):
-            filtered_data['doctor'] = original_vic.doctor
-        if permissions.get('date', True):
-            filtered_data['date'] = original_vic.date
-        if permissions.get('notes', False):
-            filtered_data['notes'] = original_vic.notes
-        
-        # Log access
+        # Log access (the served field set; the data itself is the immutable VIC row)
         log_vic_access(db, {
             'share_token': share_token,
             'accessed_by_hospital': hospital or 'unknown',
-            'accessed_data': json.dumps(filtered_data),
+            'accessed_data': encode_accessed_data(permissions),
             'ip_address': None,  # Could be added from request
             'user_agent': None   # Could be added from request
         })
         
         # Update last accessed time
         update_vic_share_last_accessed(db, share_token)
+        event_bus.publish(
+            'share.accessed',
+            share_token=share_token,
+            transaction_hash=share.original_transaction_hash,
+            patient_id=share.patient_id,
+            hospital=hospital or 'unknown'
+        )
+        refresh_analytics()
         
         return {
             'success': True,
@@ -346,26 +711,37 @@ async def get_vic_share(share_token: str, hospital: str = None, db: Session = De
         }
 
 @app.get("/api/vic-share/patient/{patient_id}")
-async def get_patient_vic_shares(patient_id: str, db: Session = Depends(get_db)):
-    """Get all VIC shares for a patient"""
+async def get_patient_vic_shares(patient_id: str, status: str = SHARE_ACTIVE, limit: int = 50, cursor: str = None,
+                                 include_vic: bool = False, db: Session = Depends(get_read_db)):
+    """A page of a patient's VIC shares, newest first
+
+    Live shares by default; status=expired|revoked|all for the rest. Pass the
+    returned next_cursor to get the following page. include_vic=true embeds a
+    summary of each shared VIC (same query, one join) so the app does not
+    need a verify call per share.
+    """
     try:
-        shares = get_vic_shares_by_patient(db, patient_id)
-        
-        return {
+        if status not in (SHARE_ACTIVE, SHARE_EXPIRED, SHARE_REVOKED, 'all'):
+            return {'success': False, 'error': f"Invalid status: {status}"}
+        try:
+            after = parse_share_page_cursor(cursor) if cursor else None
+        except ValueError:
+            return {'success': False, 'error': 'Invalid cursor'}
+        limit = max(1, min(limit, MAX_SHARE_PAGE))
+        # One extra row tells whether there is a next page
+        rows = list_vic_shares_by_patient(db, patient_id, None if status == 'all' else status,
+                                          limit=limit + 1, after=after, with_vic=include_vic)
+        page = rows[:limit]
+        shares = list(map(VIC_SHARE_ROW, page))
+        if include_vic:
+            for share, row in zip(shares, page):
+                share['vic'] = VIC_SUMMARY_ROW(row) if row.vic_block_number is not None else None
+        
+        return FastJSONResponse({
             'success': True,
-            'shares': [{
-                'id': s.id,
-                'share_token': s.share_token,
-                'original_transaction_hash': s.original_transaction_hash,
-                'shared_by': s.shared_by,
-                'shared_with_hospital': s.shared_with_hospital,
-                'access_permissions': json.loads(s.access_permissions) if s.access_permissions else {},
-                'expires_at': s.expires_at.isoformat() if s.expires_at else None,
-                'is_active': s.is_active,
-                'created_at': s.created_at.isoformat(),
-                'last_accessed': s.last_accessed.isoformat() if s.last_accessed else None
-            } for s in shares]
-        }
+            'shares': shares,
+            'next_cursor': share_page_cursor(page[-1]) if len(rows) > limit else None
+        })
         
     except Exception as e:
         return {
@@ -377,9 +753,10 @@ async def get_patient_vic_shares(patient_id: str, db: Session = Depends(get_db))
 async def revoke_vic_share_endpoint(share_token: str, db: Session = Depends(get_db)):
     """Revoke a VIC share"""
     try:
-        success = revoke_vic_share(db, share_token)
+        share = revoke_vic_share(db, share_token)
         
-        if success:
+        if share:
+            publish_share_revoked(share)
             return {
                 'success': True,
                 'message': 'VIC share revoked successfully'
@@ -397,21 +774,40 @@ async def revoke_vic_share_endpoint(share_token: str, db: Session = Depends(get_
         }
 
 @app.get("/api/vic-share/{share_token}/access-logs")
-async def get_vic_access_logs(share_token: str, db: Session = Depends(get_db)):
-    """Get access logs for a VIC share"""
+async def get_vic_access_logs(share_token: str, limit: int = 100, db: Session = Depends(get_read_db)):
+    """Get access logs for a VIC share: the latest raw entries plus daily totals for the whole history"""
+    try:
+        logs = list_vic_access_logs(db, share_token=share_token, limit=max(1, min(limit, 1000)))
+        daily = list(map(SHARE_ACCESS_DAY_ROW, list_share_access_daily(db, share_token)))
+        share = get_vic_share_by_token(db, share_token)
+        vic = get_vic_issuance_row(db, share.original_transaction_hash) if share else None
+        
+        entries = list(map(VIC_ACCESS_LOG_ROW, logs))
+        for entry in entries:
+            entry['accessed_data'] = decode_accessed_data(entry['accessed_data'], vic)
+        return FastJSONResponse({
+            'success': True,
+            'logs': entries,
+            'daily': daily,
+            'total_accesses': sum(day['accesses'] for day in daily)
+        })
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+# Analytics Endpoints
+@app.get("/api/analytics/ledger")
+def get_ledger_analytics_endpoint(top_diagnoses: int = 20):
+    """Vectorized ledger analytics (runs in the threadpool; loading is blocking I/O)"""
     try:
-        logs = get_vic_access_logs(db, share_token=share_token)
+        from analytics import get_ledger_analytics
         
         return {
             'success': True,
-            'logs': [{
-                'id': l.id,
-                'accessed_by_hospital': l.accessed_by_hospital,
-                'accessed_data': json.loads(l.accessed_data) if l.accessed_data else None,
-                'ip_address': l.ip_address,
-                'user_agent': l.user_agent,
-                'created_at': l.created_at.isoformat()
-            } for l in logs]
+            'analytics': get_ledger_analytics(top_diagnoses=top_diagnoses)
         }
         
     except Exception as e:
@@ -1,20 +1,16 @@
 import streamlit as st
-import json
-import hashlib
 import time
 from datetime import datetime
 import requests
-from typing import List, Dict, Any
+from typing import Dict
 import pandas as pd
-import streamlit.components.v1 as components
-from streamlit.web.server import Server
-import threading
-import http.server
-import socketserver
-from urllib.parse import urlparse, parse_qs
-from sqlalchemy.orm import Session
-from database import get_db, get_all_transactions, get_all_vic_issuances, get_all_blocks
-from flask import Flask, jsonify
+import os
+from database import (
+    get_db, get_ledger_counts, list_transactions, list_vic_issuances,
+    get_block_stats, get_hourly_stats, get_hospital_stats,
+    get_analytics_totals
+)
+from blockchain import Blockchain
 
 # Konfigurasi halaman
 st.set_page_config(
@@ -24,193 +20,85 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Inisialisasi session state untuk blockchain
-if 'blockchain' not in st.session_state:
-    st.session_state.blockchain = []
-    st.session_state.pending_transactions = []
+# Verify service berjalan sebagai proses terpisah (verify_server.py); explorer hanya client
+VERIFY_API_URL = os.getenv("VERIFY_API_URL", "http://verify-api:8501")
+API_SERVER_URL = os.getenv("API_SERVER_URL", "http://api-server:8502")
+LIVE_EVENTS_KEPT = 200
+EXPLORER_PAGE_SIZE = 20  # Blok / baris per halaman di explorer
+
+# Satu Blockchain (berbasis database) dipakai bersama oleh semua session dalam proses ini
+@st.cache_resource
+def get_blockchain():
+    return Blockchain()
 
-# Flask app untuk API endpoints
-flask_app = Flask(__name__)
+st.session_state.blockchain_instance = get_blockchain()
 
-@flask_app.route('/verify/<transaction_hash>')
-def verify_vic(transaction_hash):
-    """Verify VIC using transaction hash"""
+# Fungsi untuk mendapatkan jumlah baris tanpa memuat isi tabel
+def get_database_counts():
     try:
-        # Get database session
         db = next(get_db())
-        
-        # Search for VIC issuance with this transaction hash
-        vic_issuances = get_all_vic_issuances(db)
-        
-        for vic in vic_issuances:
-            if vic.transaction_hash == transaction_hash:
-                return jsonify({
-                    "verified": True,
-                    "message": "VIC verified successfully",
-                    "data": {
-                        "transaction_hash": vic.transaction_hash,
-                        "block_number": vic.block_number,
-                        "hospital": vic.hospital,
-                        "patient_id": vic.patient_id,
-                        "patient_name": vic.patient_name,
-                        "diagnosis": vic.diagnosis,
-                        "treatment": vic.treatment,
-                        "doctor": vic.doctor,
-                        "date": vic.date,
-                        "notes": vic.notes,
-                        "timestamp": vic.timestamp
-                    }
-                })
-        
-        return jsonify({
-            "verified": False,
-            "message": "VIC not found in blockchain",
-            "data": None
-        })
-        
+        return get_ledger_counts(db)
     except Exception as e:
-        return jsonify({
-            "verified": False,
-            "message": f"Verification error: {str(e)}",
-            "data": None
-        })
+        st.error(f"Database error: {e}")
+        return {'transactions': 0, 'vic_issuances': 0, 'blocks': 0}
 
-@flask_app.route('/health')
-def health_check():
-    """Health check endpoint"""
+# Fungsi untuk mendapatkan satu halaman baris dari database (terbaru dulu)
+def get_database_page(list_rows, page):
     try:
         db = next(get_db())
-        vic_count = len(get_all_vic_issuances(db))
-        transaction_count = len(get_all_transactions(db))
-        block_count = len(get_all_blocks(db))
-        
-        return jsonify({
-            "status": "healthy",
-            "database": "connected",
-            "timestamp": datetime.now().isoformat(),
-            "statistics": {
-                "total_vic_issuances": vic_count,
-                "total_transactions": transaction_count,
-                "total_blocks": block_count
-            }
-        })
+        return list_rows(db, limit=EXPLORER_PAGE_SIZE, offset=page * EXPLORER_PAGE_SIZE)
     except Exception as e:
-        return jsonify({
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e)
-        })
-
-# Start Flask server in background thread
-def start_flask_server():
-    flask_app.run(host='0.0.0.0', port=8501, debug=False, use_reloader=False)
-
-# Start Flask server
-flask_thread = threading.Thread(target=start_flask_server, daemon=True)
-flask_thread.start()
+        st.error(f"Database error: {e}")
+        return []
 
-# blockchain_instance will be initialized after Blockchain class is defined
+# Input halaman (0-based) untuk `total` baris
+def explorer_page(key, total):
+    pages = max((total + EXPLORER_PAGE_SIZE - 1) // EXPLORER_PAGE_SIZE, 1)
+    return st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key) - 1
 
-# Kelas untuk Block
-class Block:
-    def __init__(self, index: int, transactions: List[Dict], previous_hash: str, timestamp: float = None):
-        self.index = index
-        self.transactions = transactions
-        self.timestamp = timestamp or time.time()
-        self.previous_hash = previous_hash
-        self.nonce = 0
-        self.hash = self.calculate_hash()
-    
-    def calculate_hash(self):
-        block_string = f"{self.index}{self.transactions}{self.timestamp}{self.previous_hash}{self.nonce}"
-        return hashlib.sha256(block_string.encode()).hexdigest()
-    
-    def mine_block(self, difficulty: int = 2):
-        target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
-    
-    def to_dict(self):
-        return {
-            'index': self.index,
-            'transactions': self.transactions,
-            'timestamp': self.timestamp,
-            'previous_hash': self.previous_hash,
-            'hash': self.hash,
-            'nonce': self.nonce
-        }
+# Fungsi untuk verifikasi VIC melalui verify service
+def verify_vic_remote(transaction_hash: str):
+    try:
+        response = requests.get(f"{VERIFY_API_URL}/verify/{transaction_hash}", timeout=5)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        return {"verified": False, "message": f"Verify service unavailable: {e}", "data": None}
 
-# Kelas untuk Blockchain
-class Blockchain:
-    def __init__(self):
-        self.chain = []
-        self.difficulty = 2
-        self.pending_transactions = []
-        self.create_genesis_block()
-    
-    def create_genesis_block(self):
-        genesis_block = Block(0, [], "0")
-        genesis_block.mine_block(self.difficulty)
-        self.chain.append(genesis_block)
-    
-    def add_transaction(self, transaction: Dict):
-        self.pending_transactions.append(transaction)
-    
-    def mine_pending_transactions(self, mining_reward_address: str = "system"):
-        if not self.pending_transactions:
-            return False
-        
-        # Tambahkan reward untuk miner
-        reward_transaction = {
-            'from': None,
-            'to': mining_reward_address,
-            'amount': 1,
-            'type': 'mining_reward',
-            'timestamp': time.time()
-        }
-        
-        block = Block(
-            len(self.chain),
-            self.pending_transactions + [reward_transaction],
-            self.chain[-1].hash
-        )
-        
-        block.mine_block(self.difficulty)
-        self.chain.append(block)
-        self.pending_transactions = []
-        return True
-    
-    def get_balance(self, address: str):
-        balance = 0
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.get('from') == address:
-                    balance -= transaction.get('amount', 0)
-                if transaction.get('to') == address:
-                    balance += transaction.get('amount', 0)
-        return balance
+# Fungsi untuk mengambil event baru secara inkremental (resume dari sequence number)
+def fetch_live_events():
+    state = st.session_state
+    if 'live_events' not in state:
+        state.live_events = []
+        state.live_seq = 0
+        state.live_stream_id = None
+    try:
+        response = requests.get(f"{API_SERVER_URL}/api/events", params={"since": state.live_seq}, timeout=5)
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        st.warning(f"Event feed unavailable: {e}")
+        return state.live_events
     
-    def get_chain(self):
-        return [block.to_dict() for block in self.chain]
-
-# Ensure blockchain_instance is always initialized
-if 'blockchain_instance' not in st.session_state:
-    st.session_state.blockchain_instance = Blockchain()
+    if data.get('stream_id') != state.live_stream_id or not data.get('complete', True):
+        # API server restarted or we fell too far behind: start over from its buffer
+        state.live_events = []
+        state.live_stream_id = data.get('stream_id')
+        if state.live_seq:
+            state.live_seq = 0
+            return fetch_live_events()
+    state.live_events = (state.live_events + data.get('events', []))[-LIVE_EVENTS_KEPT:]
+    state.live_seq = data.get('last_seq', state.live_seq)
+    return state.live_events
 
-# Fungsi untuk mendapatkan data dari database
-def get_database_data():
+# Fungsi untuk mendapatkan data agregat analytics (hanya baca; thread maintenance API server yang melipat baris baru)
+def get_analytics_data():
     try:
         db = next(get_db())
-        transactions = get_all_transactions(db)
-        vic_issuances = get_all_vic_issuances(db)
-        blocks = get_all_blocks(db)
-        return transactions, vic_issuances, blocks
+        return get_block_stats(db), get_hourly_stats(db), get_hospital_stats(db), get_analytics_totals(db)
     except Exception as e:
         st.error(f"Database error: {e}")
-        return [], [], []
+        return [], [], [], {'blocks': 0, 'transactions': 0, 'vic_issuances': 0, 'shares_created': 0, 'share_accesses': 0}
 
-# Fungsi untuk menambahkan transaksi VIC (deprecated - now using API)
+# Fungsi untuk menambahkan transaksi VIC (pending sampai di-mine)
 def add_vic_transaction(hospital_name: str, patient_id: str, medical_data: Dict):
     transaction = {
         'from': None,
@@ -223,9 +111,7 @@ def add_vic_transaction(hospital_name: str, patient_id: str, medical_data: Dict)
         'timestamp': time.time()
     }
     
-    st.session_state.blockchain_instance.add_transaction(transaction)
-    st.session_state.pending_transactions.append(transaction)
-    return transaction
+    return st.session_state.blockchain_instance.add_transaction(transaction)
 
 # UI Streamlit
 st.title("🔗 DID Blockchain Explorer")
@@ -243,9 +129,7 @@ with st.sidebar:
             st.warning("Tidak ada transaksi pending untuk di-mine")
     
     st.header("📊 Blockchain Stats")
-    # Get data from database
-    transactions, vic_issuances, blocks = get_database_data()
-    st.metric("Total Blocks", len(blocks))
+    st.metric("Total Blocks", len(st.session_state.blockchain_instance.chain))
     st.metric("Pending Transactions", len(st.session_state.blockchain_instance.pending_transactions))
     
     # Form untuk menambahkan transaksi VIC
@@ -253,14 +137,16 @@ with st.sidebar:
     with st.form("vic_form"):
         hospital_name = st.selectbox("Hospital", ["Rumah Sakit A", "Rumah Sakit B"])
         patient_id = st.text_input("Patient ID", placeholder="P001")
+        patient_name = st.text_input("Patient Name", placeholder="John Doe")
         diagnosis = st.text_input("Diagnosis", placeholder="Common Cold")
         treatment = st.text_input("Treatment", placeholder="Rest and Medication")
         doctor = st.text_input("Doctor", placeholder="Dr. Smith")
         
         submitted = st.form_submit_button("Issue VIC", type="primary")
         
-        if submitted and patient_id:
+        if submitted and patient_id and patient_name:
             medical_data = {
+                'patient_name': patient_name,
                 'diagnosis': diagnosis,
                 'treatment': treatment,
                 'doctor': doctor,
@@ -270,19 +156,36 @@ with st.sidebar:
             transaction = add_vic_transaction(hospital_name, patient_id, medical_data)
             st.success(f"VIC issued for patient {patient_id}")
             st.rerun()
+    
+    # Verifikasi VIC melalui verify service
+    st.header("🔍 Verify VIC")
+    with st.form("verify_form"):
+        verify_hash = st.text_input("Transaction Hash", placeholder="0x...")
+        verify_submitted = st.form_submit_button("Verify")
+        
+        if verify_submitted and verify_hash:
+            result = verify_vic_remote(verify_hash)
+            if result.get('verified'):
+                st.success(result.get('message', 'VIC verified'))
+                st.json(result.get('data'))
+            else:
+                st.error(result.get('message', 'VIC not found'))
 
 # Tabs untuk berbagai view
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["📋 Blockchain", "⏳ Pending Transactions", "👤 Patient Records", "📈 Analytics", "🗄️ Database Records"])
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📋 Blockchain", "⏳ Pending Transactions", "👤 Patient Records", "📈 Analytics", "🗄️ Database Records", "📡 Live Events"])
 
 with tab1:
     st.header("Blockchain Chain")
     
-    # Get data from database
-    transactions, vic_issuances, blocks = get_database_data()
+    # Header blok dari Blockchain (dimuat inkremental); transaksi hanya dimuat untuk blok yang dibuka
+    chain = st.session_state.blockchain_instance.chain
     
-    if blocks:
-        for block in blocks:
-            with st.expander(f"Block {block.index} - {block.created_at.strftime('%Y-%m-%d %H:%M:%S')}"):
+    if chain:
+        page = explorer_page("blocks_page", len(chain))
+        end = len(chain) - page * EXPLORER_PAGE_SIZE
+        for block in reversed(chain[max(end - EXPLORER_PAGE_SIZE, 0):end]):
+            block_time = datetime.fromtimestamp(block.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            with st.expander(f"Block {block.index} - {block_time}"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
@@ -291,22 +194,20 @@ with tab1:
                     st.write(f"**Nonce:** {block.nonce}")
                 
                 with col2:
-                    st.write(f"**Timestamp:** {block.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-                    # Count transactions for this block
-                    block_transactions = [t for t in transactions if hasattr(t, 'block_id') and t.block_id == block.id]
-                    st.write(f"**Transactions:** {len(block_transactions)}")
+                    st.write(f"**Timestamp:** {block_time}")
                 
-                if block_transactions:
-                    st.write("**Transactions:**")
+                if st.toggle("Show transactions", key=f"block_transactions_{block.index}"):
+                    block_transactions = block.transactions
+                    st.write(f"**Transactions:** {len(block_transactions)}")
                     for j, tx in enumerate(block_transactions):
-                        with st.expander(f"Transaction {j+1}"):
-                            st.write(f"**Hash:** `{tx.transaction_hash}`")
-                            st.write(f"**Type:** {tx.transaction_type}")
-                            st.write(f"**Hospital:** {tx.hospital}")
-                            st.write(f"**Patient ID:** {tx.patient_id}")
-                            if tx.medical_data:
-                                st.write("**Medical Data:**")
-                                st.json(json.loads(tx.medical_data))
+                        st.markdown(f"---\n**Transaction {j+1}**")
+                        st.write(f"**Hash:** `{tx['transaction_hash']}`")
+                        st.write(f"**Type:** {tx['type']}")
+                        st.write(f"**Hospital:** {tx['hospital']}")
+                        st.write(f"**Patient ID:** {tx['patient_id']}")
+                        if tx['medical_data']:
+                            st.write("**Medical Data:**")
+                            st.json(tx['medical_data'])
     else:
         st.info("Blockchain kosong. Mine transaksi pertama untuk memulai!")
 
@@ -327,11 +228,7 @@ with tab3:
     patient_id = st.text_input("Enter Patient ID to search", placeholder="P001")
     
     if patient_id:
-        patient_transactions = []
-        for block in st.session_state.blockchain_instance.chain:
-            for tx in block.transactions:
-                if tx.get('patient_id') == patient_id and tx.get('type') == 'vic_issuance':
-                    patient_transactions.append(tx)
+        patient_transactions = st.session_state.blockchain_instance.get_patient_transactions(patient_id)
         
         if patient_transactions:
             st.success(f"Found {len(patient_transactions)} VIC records for patient {patient_id}")
@@ -344,54 +241,76 @@ with tab3:
 with tab4:
     st.header("Blockchain Analytics")
     
-    # Statistik blockchain
+    # Statistik blockchain dari tabel agregat (tidak membaca seluruh ledger)
     col1, col2, col3, col4 = st.columns(4)
     
-    # Get data from database
-    transactions, vic_issuances, blocks = get_database_data()
+    block_stats, hourly_stats, hospital_stats, totals = get_analytics_data()
     
     with col1:
-        st.metric("Total Blocks", len(blocks))
+        st.metric("Total Blocks", totals['blocks'])
     
     with col2:
         st.metric("Pending Transactions", len(st.session_state.blockchain_instance.pending_transactions))
     
     with col3:
-        st.metric("Total Transactions", len(transactions))
+        st.metric("Total Transactions", totals['transactions'])
     
     with col4:
-        st.metric("VIC Transactions", len(vic_issuances))
+        st.metric("VIC Transactions", totals['vic_issuances'])
     
     # Grafik transaksi per block
-    if blocks:
-        block_data = []
-        for block in blocks:
-            block_transactions = [t for t in transactions if hasattr(t, 'block_id') and t.block_id == block.id]
-            block_data.append({
-                'Block': block.index,
-                'Transactions': len(block_transactions),
-                'Timestamp': block.created_at.strftime('%H:%M:%S')
-            })
-        
-        df = pd.DataFrame(block_data)
+    if block_stats:
+        df = pd.DataFrame([{
+            'Block': b.block_index,
+            'Transactions': b.transactions
+        } for b in block_stats])
+        st.subheader("Transactions per Block")
         st.line_chart(df.set_index('Block')['Transactions'])
+    
+    # Grafik laju penerbitan VIC dan akses share per jam
+    if hourly_stats:
+        df = pd.DataFrame([{
+            'Hour': datetime.utcfromtimestamp(h.hour),
+            'VIC Issuances': h.vic_issuances,
+            'Shares Created': h.shares_created,
+            'Share Accesses': h.share_accesses
+        } for h in hourly_stats]).set_index('Hour')
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("VIC Issuance Rate (per hour)")
+            st.bar_chart(df['VIC Issuances'])
+        with col2:
+            st.subheader("Share Access Rate (per hour)")
+            st.line_chart(df[['Shares Created', 'Share Accesses']])
+    
+    # Grafik per rumah sakit
+    if hospital_stats:
+        df = pd.DataFrame([{
+            'Hospital': h.hospital,
+            'VIC Issuances': h.vic_issuances,
+            'Share Accesses': h.share_accesses
+        } for h in hospital_stats]).set_index('Hospital')
+        st.subheader("Per Hospital")
+        st.bar_chart(df)
 
 with tab5:
     st.header("🗄️ Database Records")
     
-    # Get data from database
-    transactions, vic_issuances, blocks = get_database_data()
+    # Jumlah dari COUNT, isi per halaman
+    counts = get_database_counts()
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Transactions", len(transactions))
+        st.metric("Total Transactions", counts['transactions'])
     with col2:
-        st.metric("VIC Issuances", len(vic_issuances))
+        st.metric("VIC Issuances", counts['vic_issuances'])
     with col3:
-        st.metric("Blocks", len(blocks))
+        st.metric("Blocks", counts['blocks'])
     
     # Display VIC Issuances
     st.subheader("🏥 VIC Issuances")
+    vic_issuances = get_database_page(list_vic_issuances, explorer_page("vic_issuances_page", counts['vic_issuances']))
     if vic_issuances:
         for vic in vic_issuances:
             with st.expander(f"VIC {vic.id} - {vic.patient_name} ({vic.hospital})"):
@@ -415,6 +334,7 @@ with tab5:
     
     # Display Transactions
     st.subheader("💳 Transactions")
+    transactions = get_database_page(list_transactions, explorer_page("transactions_page", counts['transactions']))
     if transactions:
         for tx in transactions:
             with st.expander(f"Transaction {tx.id} - {tx.transaction_type}"):
@@ -432,8 +352,30 @@ with tab5:
     else:
         st.info("No transactions found in database")
 
+with tab6:
+    st.header("📡 Live Events")
+    st.caption("Block baru, penerbitan VIC, dan aktivitas share dari API server (hanya event baru yang diambil)")
+    
+    if st.button("🔄 Fetch New Events"):
+        st.rerun()
+    
+    live_events = fetch_live_events()
+    if live_events:
+        st.dataframe(pd.DataFrame([{
+            'Seq': e['seq'],
+            'Type': e['type'],
+            'Time': datetime.fromtimestamp(e['published_at']).strftime('%H:%M:%S'),
+            'Block': e.get('block_number'),
+            'Transaction Hash': e.get('transaction_hash'),
+            'Patient ID': e.get('patient_id'),
+            'Hospital': e.get('hospital') or e.get('shared_with_hospital'),
+            'Share Token': e.get('share_token')
+        } for e in reversed(live_events)]), use_container_width=True, hide_index=True)
+    else:
+        st.info("Belum ada event baru")
+
 # Footer
 st.markdown("---")
 st.markdown("**DID Blockchain Explorer** - Demonstrasi Decentralized Identity untuk Rekam Medis Elektronik")
 
-# API server is now running separately on port 8502
+# API server is now running separately on port 8502, verify service on port 8505
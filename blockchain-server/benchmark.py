@@ -0,0 +1,1333 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite untuk blockchain server
+
+Usage:
+    python benchmark.py analytics --rows 1000000
+    python benchmark.py verify-load --url http://localhost:8505 --concurrency 64 --requests 20000
+    python benchmark.py chain-stress --issuances 5000 --threads 64 --sealers 8
+    python benchmark.py sequencer --issuances 5000 --concurrency 64
+    python benchmark.py group-commit --writes 5000 --threads 64 --max-delay-ms 2
+    python benchmark.py chain-memory --transactions 1000000 --block-size 100
+    python benchmark.py compact-columns --shares 20000 --accesses 200000
+    python benchmark.py payload-storage --issuances 20000
+    python benchmark.py serialization --rows 10000
+    python benchmark.py access-log-partitions --logs 200000   # MariaDB only
+    python benchmark.py --sqlite /tmp/bench.db chain-stress   # no MariaDB needed
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+def timed(label, func, *args, **kwargs):
+    """Run func once and print the elapsed wall time"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {label:<45} {elapsed * 1000:>10.1f} ms")
+    return result, elapsed
+
+# Analytics benchmark
+def synthetic_ledger_frames(rows, hospitals=20, diagnoses=500, seed=42):
+    """Build ledger-shaped frames with `rows` VIC issuances"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    hashes = np.array([f"0x{i:040x}" for i in range(rows)])
+    hospital_names = np.array([f"Rumah Sakit {i}" for i in range(hospitals)])
+    diagnosis_names = np.array([f"Diagnosis {i}" for i in range(diagnoses)])
+    issued_at = now - rng.uniform(0, 365 * 86400, rows)
+
+    vic_issuances = pd.DataFrame({
+        'transaction_hash': hashes,
+        'hospital': pd.Categorical(hospital_names[rng.integers(0, hospitals, rows)]),
+        'diagnosis': pd.Categorical(diagnosis_names[rng.zipf(1.5, rows) % diagnoses]),
+        'timestamp': issued_at
+    })
+    transactions = pd.DataFrame({
+        'block_id': np.arange(1, rows + 1),
+        'transaction_type': pd.Categorical(np.full(rows, 'vic_issuance')),
+        'hospital': vic_issuances['hospital'],
+        'timestamp': issued_at
+    })
+
+    shares = rows // 2
+    shared_idx = rng.integers(0, rows, shares)
+    shared_at = issued_at[shared_idx] + rng.exponential(3600, shares)
+    vic_shares = pd.DataFrame({
+        'share_token': np.array([f"VIC_{i:012d}" for i in range(shares)]),
+        'original_transaction_hash': hashes[shared_idx],
+        'is_active': rng.random(shares) > 0.1,
+        'created_at': pd.to_datetime(shared_at, unit='s')
+    })
+
+    accesses = rows
+    access_idx = rng.integers(0, shares, accesses)
+    vic_access_logs = pd.DataFrame({
+        'share_token': vic_shares['share_token'].to_numpy()[access_idx],
+        'accessed_by_hospital': pd.Categorical(hospital_names[rng.integers(0, hospitals, accesses)]),
+        'created_at': pd.to_datetime(shared_at[access_idx] + rng.exponential(600, accesses), unit='s')
+    })
+    # Folded like analytics_share_access_daily: one row per share/day/hospital
+    share_access_daily = vic_access_logs.groupby(
+        ['share_token', vic_access_logs['created_at'].dt.floor('D'), 'accessed_by_hospital'], observed=True
+    )['created_at'].agg(['min', 'size']).reset_index(level=[0, 2]).reset_index(drop=True).rename(
+        columns={'min': 'created_at', 'size': 'accesses'}
+    )
+    return {
+        'transactions': transactions,
+        'vic_issuances': vic_issuances,
+        'vic_shares': vic_shares,
+        'share_access_daily': share_access_daily
+    }
+
+def loop_ledger_analytics(frames):
+    """Baseline: the same metrics computed with per-row Python loops"""
+    by_hospital, by_diagnosis = {}, {}
+    issued_at = {}
+    for row in frames['vic_issuances'].itertuples(index=False):
+        by_hospital[row.hospital] = by_hospital.get(row.hospital, 0) + 1
+        key = str(row.diagnosis).strip().lower()
+        by_diagnosis[key] = by_diagnosis.get(key, 0) + 1
+        issued_at[row.transaction_hash] = row.timestamp
+    first_share, share_created = {}, {}
+    for row in frames['vic_shares'].itertuples(index=False):
+        created = row.created_at.timestamp()
+        share_created[row.share_token] = (row.original_transaction_hash, created)
+        current = first_share.get(row.original_transaction_hash)
+        if current is None or created < current:
+            first_share[row.original_transaction_hash] = created
+    first_access = {}
+    for row in frames['share_access_daily'].itertuples(index=False):
+        accessed = row.created_at.timestamp()
+        current = first_access.get(row.share_token)
+        if current is None or accessed < current:
+            first_access[row.share_token] = accessed
+    accessed_vics = {share_created[token][0] for token in first_access}
+    latencies = sorted(first_share[h] - issued_at[h] for h in first_share)
+    return {
+        'issuances_by_hospital': by_hospital,
+        'diagnosis_frequency': by_diagnosis,
+        'shared': len(first_share),
+        'accessed': len(accessed_vics),
+        'issue_to_first_share_p50': latencies[len(latencies) // 2] if latencies else None
+    }
+
+def bench_analytics(args):
+    from analytics import compute_ledger_analytics, load_ledger_frames
+
+    if args.from_db:
+        frames, _ = timed("load ledger columns (chunked read_sql)", load_ledger_frames, chunksize=args.chunksize)
+    else:
+        frames, _ = timed(f"generate synthetic ledger ({args.rows:,} VICs)", synthetic_ledger_frames, args.rows)
+    print("📦 Rows: " + ", ".join(f"{table}={len(frame):,}" for table, frame in frames.items()))
+
+    result, vectorized = timed("vectorized analytics (pandas/NumPy)", compute_ledger_analytics, frames)
+    if not args.skip_loop:
+        _, loop = timed("baseline analytics (Python loops)", loop_ledger_analytics, frames)
+        print(f"🚀 Speedup: {loop / vectorized:.1f}x")
+    print(f"📊 Funnel: {result['share_access_funnel']}")
+    print(f"⏳ Latency (s): {result['latency_seconds']}")
+
+# Verify load generator
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+def fetch_sample_hashes(api_url, limit):
+    """Take real transaction hashes from the API server"""
+    import requests
+
+    response = requests.get(f"{api_url}/api/vic-issuances", timeout=30)
+    response.raise_for_status()
+    return [v['transaction_hash'] for v in response.json().get('vic_issuances', [])[:limit]]
+
+def bench_verify_load(args):
+    import itertools
+    import threading
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+
+    hashes = args.hash or fetch_sample_hashes(args.api_url, args.sample)
+    if not hashes:
+        print("❌ No transaction hashes to verify (issue some VICs or pass --hash)")
+        return
+    print(f"🎯 Target: {args.url}/verify/<hash> ({len(hashes)} distinct hashes)")
+    print(f"🧵 Concurrency: {args.concurrency}, requests: {args.requests:,}")
+
+    local = threading.local()
+    next_hash = itertools.cycle(hashes).__next__
+    lock = threading.Lock()
+
+    def one_request(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        with lock:
+            transaction_hash = next_hash()
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{args.url}/verify/{transaction_hash}", timeout=args.timeout)
+            ok = response.status_code == 200 and response.json().get('verified') is True
+        except requests.exceptions.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    print(f"✅ Completed: {len(results) - errors:,}  ❌ Errors: {errors:,}")
+    print(f"🚀 Throughput: {len(results) / elapsed:,.0f} req/s over {elapsed:.2f}s")
+    print("⏱️  Latency (ms): " + ", ".join(f"p{p}={percentile(latencies, p):.1f}" for p in (50, 90, 95, 99)))
+
+# Chain stress test: parallel issuances and competing block sealers
+def stress_issuance(index):
+    medical_data = {
+        'patient_name': f"Stress Patient {index}",
+        'diagnosis': "Stress Test",
+        'treatment': "None",
+        'doctor': "Dr. Bench",
+        'date': datetime.now().strftime('%Y-%m-%d')
+    }
+    return {'hospital': f"Rumah Sakit {index % 4}", 'patient_id': f"STRESS{index:06d}", 'medical_data': medical_data}
+
+def submit_local(mempool, session_factory, index):
+    import hashlib
+    import json
+
+    data = stress_issuance(index)
+    timestamp = time.time()
+    db = session_factory()
+    try:
+        mempool.submit(db, {
+            'transaction_hash': '0x' + hashlib.sha256(f"stress-{index}-{timestamp}".encode()).hexdigest()[:40],
+            'to_address': data['patient_id'],
+            'amount': 1,
+            'transaction_type': 'vic_issuance',
+            'hospital': data['hospital'],
+            'patient_id': data['patient_id'],
+            'medical_data': json.dumps(data['medical_data']),
+            'timestamp': timestamp
+        })
+    finally:
+        db.close()
+    return True
+
+def submit_http(session_local, url, index):
+    import requests
+
+    session = getattr(session_local, 'session', None)
+    if session is None:
+        session = session_local.session = requests.Session()
+    try:
+        response = session.post(f"{url}/api/issue-vic", json=stress_issuance(index), timeout=30)
+        return response.ok and response.json().get('success') is True
+    except requests.exceptions.RequestException:
+        return False
+
+def bench_chain_stress(args):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import func
+    from database import engine, SessionLocal, Transaction, create_tables
+    from mempool import Mempool, seal_block, chain_integrity_errors
+
+    engine.echo = False  # SQL logging would dominate the timings
+    create_tables()
+    mempool = Mempool(args.block_size)
+    done = threading.Event()
+    sealed = []
+
+    def sealer():
+        # Every sealer races for the next block height, like producers in separate workers
+        db = SessionLocal()
+        try:
+            while True:
+                finished = done.is_set()
+                try:
+                    summary = seal_block(db, args.block_size)
+                except Exception as e:
+                    db.rollback()
+                    print(f"⚠️  Sealer error: {e}")
+                    continue
+                if summary is not None:
+                    sealed.append(summary['block_number'])
+                elif finished:
+                    return
+                else:
+                    time.sleep(0.01)
+        finally:
+            db.close()
+
+    session_local = threading.local()
+    print(f"🧵 {args.issuances:,} issuances from {args.threads} threads, {args.sealers} competing sealers")
+    start = time.perf_counter()
+    sealers = [threading.Thread(target=sealer) for _ in range(args.sealers)] if not args.url else []
+    for thread in sealers:
+        thread.start()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        if args.url:
+            results = list(pool.map(lambda i: submit_http(session_local, args.url, i), range(args.issuances)))
+        else:
+            results = list(pool.map(lambda i: submit_local(mempool, SessionLocal, i), range(args.issuances)))
+    done.set()
+    for thread in sealers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    try:
+        if args.url:
+            # Let the server's block producer drain the mempool
+            deadline = time.time() + args.drain_timeout
+            while db.query(func.count(Transaction.id)).filter(Transaction.block_id.is_(None)).scalar() and time.time() < deadline:
+                db.rollback()
+                time.sleep(0.5)
+        pending = db.query(func.count(Transaction.id)).filter(Transaction.block_id.is_(None)).scalar()
+        errors = chain_integrity_errors(db)
+    finally:
+        db.close()
+
+    failed = sum(1 for ok in results if not ok)
+    print(f"✅ Submitted: {len(results) - failed:,}  ❌ Failed: {failed:,}  in {elapsed:.2f}s")
+    if sealed:
+        print(f"⛓️  Blocks sealed here: {len(sealed):,} (heights {min(sealed)}..{max(sealed)})")
+    print(f"⏳ Still pending: {pending:,}")
+    for error in errors[:20]:
+        print(f"❌ {error}")
+    if errors or pending or failed:
+        raise SystemExit(f"Chain stress test FAILED ({len(errors)} integrity errors)")
+    print("🎉 Chain is gap-free and fork-free")
+
+# Sequencer vs lock-based appends
+def stress_transaction(index):
+    import hashlib
+    import json
+
+    data = stress_issuance(index)
+    timestamp = time.time()
+    return {
+        'transaction_hash': '0x' + hashlib.sha256(f"seq-{index}-{timestamp}".encode()).hexdigest()[:40],
+        'to_address': data['patient_id'],
+        'amount': 1,
+        'transaction_type': 'vic_issuance',
+        'hospital': data['hospital'],
+        'patient_id': data['patient_id'],
+        'medical_data': json.dumps(data['medical_data']),
+        'timestamp': timestamp
+    }
+
+def locked_append(session_factory, lock, transaction_data):
+    """Baseline: lock the tip, append a one-transaction block, commit"""
+    import json
+    from database import Block, transaction_rows
+    from mempool import block_hash_for, vic_issuance_from_transaction
+
+    with lock:
+        db = session_factory()
+        try:
+            tip = db.query(Block).order_by(Block.index.desc()).with_for_update().first()
+            index = tip.index + 1 if tip else 1
+            previous_hash = tip.hash if tip else "0"
+            timestamp = time.time()
+            block = Block(index=index, timestamp=timestamp, previous_hash=previous_hash, nonce=0,
+                          hash=block_hash_for(index, timestamp, previous_hash, [transaction_data['transaction_hash']]))
+            db.add(block)
+            db.flush()
+            rows = transaction_rows(dict(transaction_data, block_id=block.id))
+            db.add_all(rows)
+            vic = vic_issuance_from_transaction(rows[0], index, json.loads(transaction_data['medical_data']))
+            if vic is not None:
+                db.add(vic)
+            db.commit()
+        finally:
+            db.close()
+
+def report_latencies(label, latencies, elapsed, blocks):
+    latencies = sorted(latency * 1000 for latency in latencies)
+    print(f"📈 {label}: {len(latencies) / elapsed:,.0f} VIC/s, {blocks:,} blocks, "
+          + ", ".join(f"p{p}={percentile(latencies, p):.1f}ms" for p in (50, 99)))
+
+def bench_sequencer(args):
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import func
+    from database import engine, SessionLocal, Block, create_tables
+    from mempool import chain_integrity_errors
+    from sequencer import BlockSequencer
+
+    engine.echo = False  # SQL logging would dominate the timings
+    create_tables()
+
+    def block_count():
+        db = SessionLocal()
+        try:
+            return db.query(func.count(Block.id)).scalar()
+        finally:
+            db.close()
+
+    print(f"🧵 {args.issuances:,} issuances, concurrency {args.concurrency}")
+    if not args.skip_lock:
+        lock = threading.Lock()
+
+        def one_locked(index):
+            transaction_data = stress_transaction(index)
+            start = time.perf_counter()
+            locked_append(SessionLocal, lock, transaction_data)
+            return time.perf_counter() - start
+
+        before = block_count()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(one_locked, range(args.issuances)))
+        report_latencies("lock-based appends", latencies, time.perf_counter() - start, block_count() - before)
+
+    async def run_sequencer():
+        sequencer = BlockSequencer(max_batch=args.max_batch)
+        sequencer.start()
+        limit = asyncio.Semaphore(args.concurrency)
+
+        async def one(index):
+            async with limit:
+                start = time.perf_counter()
+                await sequencer.submit(stress_transaction(index))
+                return time.perf_counter() - start
+
+        try:
+            return await asyncio.gather(*(one(i) for i in range(args.issuances)))
+        finally:
+            await sequencer.stop()
+
+    before = block_count()
+    start = time.perf_counter()
+    latencies = asyncio.run(run_sequencer())
+    report_latencies("single-writer sequencer", latencies, time.perf_counter() - start, block_count() - before)
+
+    db = SessionLocal()
+    try:
+        errors = chain_integrity_errors(db)
+    finally:
+        db.close()
+    print("🎉 Chain is consistent" if not errors else f"❌ {len(errors)} chain integrity errors, e.g. {errors[0]}")
+
+# Group commit vs one commit per write
+def bench_group_commit(args):
+    from concurrent.futures import ThreadPoolExecutor
+    from database import engine, SessionLocal, save_transaction, create_tables
+    from group_commit import GroupCommitter
+
+    engine.echo = False  # SQL logging would dominate the timings
+    create_tables()
+    print(f"🧵 {args.writes:,} pending-transaction writes from {args.threads} threads")
+
+    def one_direct(index):
+        transaction_data = stress_transaction(index)
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            save_transaction(db, transaction_data)
+        finally:
+            db.close()
+        return time.perf_counter() - start
+
+    if not args.skip_direct:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            latencies = list(pool.map(one_direct, range(args.writes)))
+        elapsed = time.perf_counter() - start
+        latencies = sorted(latency * 1000 for latency in latencies)
+        print(f"📈 save_transaction (commit per write): {args.writes / elapsed:,.0f} writes/s, {args.writes:,} commits, "
+              + ", ".join(f"p{p}={percentile(latencies, p):.1f}ms" for p in (50, 99)))
+
+    committer = GroupCommitter(max_delay=args.max_delay_ms / 1000, max_batch=args.max_batch)
+
+    def one_grouped(index):
+        transaction_data = stress_transaction(args.writes + index)
+        start = time.perf_counter()
+        committer.save_transaction(transaction_data)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = list(pool.map(one_grouped, range(args.writes)))
+    elapsed = time.perf_counter() - start
+    committer.stop()
+    latencies = sorted(latency * 1000 for latency in latencies)
+    print(f"📈 group commit ({args.max_delay_ms}ms / {args.max_batch}): {args.writes / elapsed:,.0f} writes/s, "
+          f"{committer.commits:,} commits (avg batch {committer.writes / max(committer.commits, 1):.1f}), "
+          + ", ".join(f"p{p}={percentile(latencies, p):.1f}ms" for p in (50, 99)))
+
+# In-memory chain: dict transactions vs columnar blocks
+def synthetic_block_transactions(block_number, block_size, patients=50_000, hospitals=20):
+    import hashlib
+    import random
+
+    rng = random.Random(block_number)
+    transactions = []
+    for position in range(block_size - 1):
+        patient_id = f"P{rng.randrange(patients):06d}"
+        timestamp = 1_700_000_000 + block_number * 10 + position / block_size
+        transactions.append({
+            'transaction_hash': '0x' + hashlib.sha256(f"{block_number}-{position}".encode()).hexdigest()[:40],
+            'from': None,
+            'to': patient_id,
+            'amount': 1.0,
+            'type': 'vic_issuance',
+            'hospital': f"Hospital {rng.randrange(hospitals) + 1}",
+            'patient_id': patient_id,
+            'medical_data': {'patient_id': patient_id, 'diagnosis': f"D{rng.randrange(500):03d}",
+                             'vic_hash': hashlib.sha256(f"vic-{block_number}-{position}".encode()).hexdigest()},
+            'timestamp': timestamp
+        })
+    transactions.append({
+        'transaction_hash': '0x' + hashlib.sha256(f"reward-{block_number}".encode()).hexdigest()[:40],
+        'from': None, 'to': 'system', 'amount': 1.0, 'type': 'mining_reward', 'hospital': None,
+        'patient_id': None, 'medical_data': None, 'timestamp': 1_700_000_000.0 + block_number * 10 + 1
+    })
+    return transactions
+
+def measure_chain(build):
+    """Bytes still allocated after build() (the result is kept alive while measuring)"""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    chain = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chain, size, elapsed
+
+def bench_chain_memory(args):
+    from blockchain import Block, TransactionColumns
+
+    blocks = max(args.transactions // args.block_size, 1)
+    total = blocks * args.block_size
+    print(f"⛓️  {blocks:,} blocks x {args.block_size} transactions = {total:,} transactions")
+
+    class DictBlock:
+        """The previous representation: attribute dict per block, list of dicts per block"""
+        def __init__(self, index, transactions, previous_hash, timestamp, block_id, hash, nonce):
+            self.index = index
+            self._transactions = transactions
+            self.timestamp = timestamp
+            self.previous_hash = previous_hash
+            self.nonce = nonce
+            self.block_id = block_id
+            self.hash = hash
+
+    def build(block_class, store):
+        chain = []
+        previous_hash = "0"
+        for number in range(1, blocks + 1):
+            block_hash = f"{number:064x}"
+            chain.append(block_class(number, store(synthetic_block_transactions(number, args.block_size)),
+                                     previous_hash, 1_700_000_000.0 + number, number, block_hash, 0))
+            previous_hash = block_hash
+        return chain
+
+    results = {}
+    if not args.skip_dicts:
+        chain, results['dicts'], elapsed = measure_chain(lambda: build(DictBlock, list))
+        print(f"📦 list of dicts : {results['dicts'] / 2**20:>10,.1f} MiB "
+              f"({results['dicts'] / total:,.0f} B/tx, built in {elapsed:.1f}s)")
+        sample = chain[blocks // 2]._transactions
+        del chain
+    chain, results['columns'], elapsed = measure_chain(lambda: build(Block, TransactionColumns.from_dicts))
+    print(f"📦 columnar      : {results['columns'] / 2**20:>10,.1f} MiB "
+          f"({results['columns'] / total:,.0f} B/tx, built in {elapsed:.1f}s)")
+
+    if 'dicts' in results:
+        # Same dicts back out of the columns
+        restored = chain[blocks // 2].transactions
+        if restored != sample:
+            raise SystemExit("Columnar round trip FAILED")
+        print(f"🎉 {results['dicts'] / results['columns']:.1f}x smaller, round trip identical")
+
+    start = time.perf_counter()
+    scanned = sum(len(block.transactions) for block in chain[:min(blocks, 1000)])
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  materialized {scanned:,} transaction dicts in {elapsed * 1000:.1f} ms "
+          f"({elapsed / max(scanned, 1) * 1e6:.2f} µs/tx)")
+
+# Compact share / access log columns vs JSON copies
+def bench_compact_columns(args):
+    import json
+    import random
+    import tempfile
+    from types import SimpleNamespace
+    from sqlalchemy import insert
+    from database import (
+        Base, VICShares, VICAccessLogs, create_database_engine, encode_permissions, decode_permissions,
+        encode_accessed_data, decode_accessed_data, shared_vic_data, VIC_SHARE_FIELDS
+    )
+
+    rng = random.Random(42)
+    vic = SimpleNamespace(**stress_issuance(0)['medical_data'], notes='Kontrol ulang 2 minggu', transaction_hash='0x' + 'ab' * 20, block_number=1,
+                          hospital='Hospital 1', patient_id='P000000', timestamp=time.time())
+    permission_sets = [{field: rng.random() < 0.7 for field in VIC_SHARE_FIELDS} for _ in range(32)]
+    shares = [permission_sets[rng.randrange(len(permission_sets))] for _ in range(args.shares)]
+    accesses = [shares[rng.randrange(len(shares))] for _ in range(args.accesses)]
+    print(f"🔐 {args.shares:,} shares, {args.accesses:,} access logs")
+
+    variants = {
+        'json': (lambda p: json.dumps(p), lambda p: json.dumps(shared_vic_data(vic, p)),
+                 json.loads, json.loads),
+        'compact': (encode_permissions, encode_accessed_data,
+                    decode_permissions, lambda value: decode_accessed_data(value, vic)),
+    }
+    sizes = {}
+    for name, (encode_share, encode_access, decode_share, decode_access) in variants.items():
+        start = time.perf_counter()
+        share_values = [encode_share(p) for p in shares]
+        access_values = [encode_access(p) for p in accesses]
+        encode_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        for value in share_values:
+            decode_share(value)
+        for value in access_values:
+            decode_access(value)
+        decode_elapsed = time.perf_counter() - start
+
+        column_bytes = sum(map(len, share_values)) + sum(map(len, access_values))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"{name}.db")
+            engine = create_database_engine(f"sqlite:///{path}")
+            engine.echo = False
+            Base.metadata.create_all(engine, tables=[VICShares.__table__, VICAccessLogs.__table__])
+            with engine.begin() as connection:
+                connection.execute(insert(VICShares), [{
+                    'share_token': f"VIC_{i:032d}", 'original_transaction_hash': vic.transaction_hash,
+                    'patient_id': vic.patient_id, 'shared_by': 'bench', 'access_permissions': value
+                } for i, value in enumerate(share_values)])
+                connection.execute(insert(VICAccessLogs), [{
+                    'share_token': f"VIC_{i % args.shares:032d}", 'accessed_by_hospital': 'Hospital 2',
+                    'accessed_data': value
+                } for i, value in enumerate(access_values)])
+            with engine.connect() as connection:
+                connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            engine.dispose()
+            sizes[name] = os.path.getsize(path)
+        total = len(share_values) + len(access_values)
+        print(f"📦 {name:<8} columns {column_bytes / 2**20:>7.1f} MiB, file {sizes[name] / 2**20:>7.1f} MiB, "
+              f"encode {encode_elapsed / total * 1e6:.2f} µs/row, decode {decode_elapsed / total * 1e6:.2f} µs/row")
+    print(f"🎉 {sizes['json'] / sizes['compact']:.1f}x smaller database")
+
+# Bytes per VIC: inline copies vs the content-addressed payload store
+def storage_report(engine, issuances):
+    """Bytes per VIC in the transactions, vic_issuances and vic_payloads tables (SQLite dbstat)"""
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.exec_driver_sql("VACUUM")
+        # Table b-trees plus their indexes (ix_<table>_*, sqlite_autoindex_<table>_*)
+        sizes = connection.exec_driver_sql("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall()
+    tables = dict.fromkeys(('transactions', 'vic_issuances', 'vic_payloads'), 0)
+    for name, size in sizes:
+        for table in tables:
+            if name == table or name.startswith((f"ix_{table}_", f"sqlite_autoindex_{table}_")):
+                tables[table] += size
+    return {table: size / issuances for table, size in tables.items()}
+
+def bench_payload_storage(args):
+    import json
+    import random
+    import tempfile
+    from database import (
+        Base, VICPayload, create_database_engine, transaction_from_data, transaction_rows,
+        vic_issuance_from_data, encode_medical_data
+    )
+    from sqlalchemy.orm import sessionmaker
+
+    rng = random.Random(7)
+    treatments = ["Istirahat dan paracetamol 3x sehari selama 5 hari", "Fisioterapi dua kali seminggu",
+                  "Antibiotik amoxicillin 500mg, kontrol ulang setelah obat habis"]
+    print(f"🩺 {args.issuances:,} VIC issuances ({args.duplicates:.0%} resubmitted payloads)")
+
+    payloads = []
+    for index in range(args.issuances):
+        if payloads and rng.random() < args.duplicates:
+            payloads.append(payloads[rng.randrange(len(payloads))])
+            continue
+        medical_data = dict(stress_issuance(index)['medical_data'], treatment=rng.choice(treatments),
+                            notes="Pasien disarankan kontrol ulang dan menjaga pola makan. " * rng.randint(0, 3))
+        payloads.append(encode_medical_data(medical_data))
+
+    results = {}
+    for variant in ('inline', 'payload-store'):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_database_engine(f"sqlite:///{os.path.join(directory, 'ledger.db')}")
+            engine.echo = False
+            Base.metadata.create_all(engine)
+            session = sessionmaker(bind=engine, autoflush=False)()
+            start = time.perf_counter()
+            for index, payload in enumerate(payloads):
+                medical_data = json.loads(payload)
+                transaction_data = dict(stress_transaction(index), medical_data=payload, block_id=1)
+                vic_data = dict(medical_data, transaction_hash=transaction_data['transaction_hash'], block_number=1,
+                                hospital=transaction_data['hospital'], patient_id=transaction_data['patient_id'],
+                                timestamp=transaction_data['timestamp'])
+                if variant == 'inline':
+                    # The layout before the payload store: JSON on the transaction, every field on the VIC row
+                    tx = transaction_from_data(transaction_data)
+                    tx.payload_hash, tx.medical_data = None, payload
+                    session.add_all([tx, vic_issuance_from_data(vic_data)])
+                else:
+                    rows = transaction_rows(transaction_data)
+                    session.add_all(rows)
+                    session.add(vic_issuance_from_data(vic_data, payload_hash=rows[0].payload_hash))
+                if index % 500 == 499:
+                    session.commit()
+            session.commit()
+            elapsed = time.perf_counter() - start
+            stored = session.query(VICPayload).count()
+            session.close()
+            results[variant] = storage_report(engine, args.issuances)
+            engine.dispose()
+        per_vic = sum(results[variant].values())
+        breakdown = ", ".join(f"{table} {size:,.0f}" for table, size in sorted(results[variant].items()))
+        print(f"📦 {variant:<14} {per_vic:>7,.0f} B/VIC ({breakdown}); {stored:,} payload rows; "
+              f"written in {elapsed:.1f}s")
+    before, after = (sum(results[v].values()) for v in ('inline', 'payload-store'))
+    print(f"🎉 {before / after:.2f}x less storage per VIC")
+
+# Response serialization for list endpoints
+def seed_vic_issuances(rows):
+    """Make sure the vic_issuances table holds at least `rows` rows (payload-backed, like new issuances)"""
+    import json
+    from database import SessionLocal, VICIssuance, create_tables, transaction_rows, vic_issuance_from_data
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        existing = db.query(VICIssuance).count()
+        for index in range(existing, rows):
+            transaction_data = dict(stress_transaction(index), block_id=None)
+            medical_data = json.loads(transaction_data['medical_data'])
+            tx, *payload = transaction_rows(transaction_data)
+            db.add_all(payload)
+            db.add(vic_issuance_from_data(dict(
+                medical_data, transaction_hash=tx.transaction_hash, block_number=index // 100 + 1,
+                hospital=tx.hospital, patient_id=tx.patient_id, timestamp=tx.timestamp
+            ), payload_hash=tx.payload_hash))
+            if index % 1000 == 999:
+                db.commit()
+        db.commit()
+    finally:
+        db.close()
+
+def bench_serialization(args):
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from starlette.responses import JSONResponse
+    from database import SessionLocal, get_all_vic_issuances
+    import fast_json
+    from api_server import VIC_ISSUANCE_ROW
+
+    seed_vic_issuances(args.rows)
+    print(f"🧾 /api/vic-issuances with {args.rows:,} rows (orjson {'available' if fast_json.orjson else 'NOT installed'})")
+
+    def load():
+        db = SessionLocal()
+        try:
+            return get_all_vic_issuances(db)[:args.rows]
+        finally:
+            db.close()
+
+    def dict_comprehension(rows):
+        # Previous endpoint: hand-built dicts, FastAPI's jsonable_encoder, stdlib JSONResponse
+        content = {"vic_issuances": [{
+            "id": v.id, "transaction_hash": v.transaction_hash, "block_number": v.block_number,
+            "hospital": v.hospital, "patient_id": v.patient_id, "patient_name": v.patient_name,
+            "diagnosis": v.diagnosis, "treatment": v.treatment, "doctor": v.doctor, "date": v.date,
+            "notes": v.notes, "timestamp": v.timestamp, "created_at": v.created_at.isoformat()
+        } for v in rows]}
+        return JSONResponse(jsonable_encoder(content)).body
+
+    def projected(rows, orjson):
+        saved, fast_json.orjson = fast_json.orjson, orjson
+        try:
+            return fast_json.FastJSONResponse({"vic_issuances": list(map(VIC_ISSUANCE_ROW, rows))}).body
+        finally:
+            fast_json.orjson = saved
+
+    variants = [("dicts + jsonable_encoder + json", dict_comprehension),
+                ("projection + stdlib json", lambda rows: projected(rows, None))]
+    if fast_json.orjson is not None:
+        variants.append(("projection + orjson", lambda rows: projected(rows, fast_json.orjson)))
+    bodies = []
+    baseline = None
+    for label, serialize in variants:
+        load_times, serialize_times = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            rows = load()
+            loaded = time.perf_counter()
+            body = serialize(rows)
+            load_times.append(loaded - start)
+            serialize_times.append(time.perf_counter() - loaded)
+        bodies.append(body)
+        best = min(serialize_times)
+        baseline = baseline or best
+        print(f"⏱️  {label:<34} serialize {best * 1000:>7.1f} ms ({baseline / best:4.1f}x), "
+              f"load {min(load_times) * 1000:>7.1f} ms, {len(body) / 1024:,.0f} KiB")
+    decoded = [json.loads(body) for body in bodies]
+    if any(body != decoded[0] for body in decoded[1:]):
+        raise SystemExit("Serialized responses differ")
+    print("🎉 All variants produce the same JSON")
+
+def bench_read_paths(args):
+    import json
+    import tracemalloc
+    from database import (
+        engine, SessionLocal, ReadSessionLocal, get_all_vic_issuances, get_vic_issuance_by_hash,
+        list_vic_issuances, get_vic_issuance_row
+    )
+    from api_server import VIC_ISSUANCE_ROW
+    from verify_service import vic_to_dict
+
+    engine.echo = False  # SQL logging would dominate the CPU times
+    seed_vic_issuances(args.rows)
+    db = ReadSessionLocal()
+    try:
+        hashes = [row.transaction_hash for row in list_vic_issuances(db)[:args.lookups]]
+    finally:
+        db.close()
+    print(f"📖 Read paths over {args.rows:,} VIC rows ({len(hashes):,} verify lookups)")
+
+    def listing(session_factory, load):
+        db = session_factory()
+        try:
+            return list(map(VIC_ISSUANCE_ROW, load(db)))
+        finally:
+            db.close()
+
+    def verify(session_factory, lookup):
+        db = session_factory()
+        try:
+            return [vic_to_dict(lookup(db, transaction_hash)) for transaction_hash in hashes]
+        finally:
+            db.close()
+
+    variants = [
+        ("list: ORM entities", lambda: listing(SessionLocal, get_all_vic_issuances)),
+        ("list: column rows", lambda: listing(ReadSessionLocal, list_vic_issuances)),
+        ("verify: ORM entity", lambda: verify(SessionLocal, get_vic_issuance_by_hash)),
+        ("verify: column row", lambda: verify(ReadSessionLocal, get_vic_issuance_row)),
+    ]
+    results = {}
+    for label, run in variants:
+        cpu_times = []
+        for _ in range(args.repeat):
+            start = time.process_time()
+            result = run()
+            cpu_times.append(time.process_time() - start)
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[label] = json.dumps(result, default=str, sort_keys=True)
+        print(f"⏱️  {label:<22} CPU {min(cpu_times) * 1000:>8.1f} ms, peak {peak / 1024 / 1024:>7.2f} MiB")
+    if results["list: ORM entities"] != results["list: column rows"] or \
+            results["verify: ORM entity"] != results["verify: column row"]:
+        raise SystemExit("Column rows differ from ORM entities")
+    print("🎉 Column rows match the ORM entities")
+
+def bench_read_replica(args):
+    import multiprocessing
+    import sqlite3
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    if not args.sqlite:
+        raise SystemExit("read-replica needs --sqlite PATH (the primary)")
+    replica_path = os.path.abspath(args.replica or f"{os.path.splitext(args.sqlite)[0]}-replica.db")
+    os.environ["DATABASE_READ_URL"] = f"sqlite:///{replica_path}"
+    from sqlalchemy import select
+    from database import engine, read_engine, SessionLocal, read_session, create_tables, VICIssuance
+    from verify_service import verify_transaction
+    engine.echo = read_engine.echo = False
+
+    def replicate():
+        # Stand-in for MariaDB replication: online backup of the primary file into the replica file
+        read_engine.dispose()
+        source, target = sqlite3.connect(os.path.abspath(args.sqlite)), sqlite3.connect(replica_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    create_tables()
+    seed_vic_issuances(args.rows)
+    replicate()
+    with read_session() as db:
+        hashes = db.execute(select(VICIssuance.transaction_hash)).scalars().all()
+    print(f"🪞 Primary {args.sqlite}, replica {replica_path} ({len(hashes):,} VICs)")
+
+    # Read-your-writes: a VIC issued after the last replication must verify right away
+    transaction_data = stress_transaction(args.rows + args.writes * 2)
+    locked_append(SessionLocal, threading.Lock(), transaction_data)
+    with read_session() as db:
+        on_replica = db.execute(select(VICIssuance.id).where(
+            VICIssuance.transaction_hash == transaction_data['transaction_hash'])).first()
+        verified = verify_transaction(db, transaction_data['transaction_hash'])['verified']
+    if on_replica is not None or not verified:
+        raise SystemExit("Read-your-writes check FAILED")
+    print("✅ Fresh VIC missing on the replica still verifies (confirmed on the primary)")
+
+    lock = threading.Lock()
+    context = multiprocessing.get_context("fork")
+    for label, primary in (("verify on primary", True), ("verify on replica", False)):
+        # Readers in their own processes, like verify_server workers (threads would only contend on the GIL)
+        done = context.Event()
+        counts = context.Queue()
+        readers = [context.Process(target=replica_reader, args=(primary, hashes, done, counts))
+                   for _ in range(args.readers)]
+        for process in readers:
+            process.start()
+
+        def one_write(index):
+            transaction_data = stress_transaction(index)
+            start = time.perf_counter()
+            locked_append(SessionLocal, lock, transaction_data)
+            return time.perf_counter() - start
+
+        offset = args.rows + (0 if primary else args.writes)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.writers) as pool:
+            latencies = list(pool.map(one_write, range(offset, offset + args.writes)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        verified = sum(counts.get() for _ in readers)
+        for process in readers:
+            process.join()
+        report_latencies(f"issuance, {label}", latencies, elapsed, args.writes)
+        print(f"   🔎 {verified / elapsed:,.0f} verifies/s from {args.readers} reader processes")
+
+def replica_reader(primary, hashes, done, counts):
+    import random
+    from database import engine, read_engine, read_session
+    from verify_service import verify_transaction
+    # Forked: never reuse the parent's pooled connections
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+    rng = random.Random()
+    count = 0
+    while not done.is_set():
+        with read_session(primary=primary) as db:
+            verify_transaction(db, rng.choice(hashes))
+        count += 1
+    counts.put(count)
+
+def bench_access_logs(args):
+    import random
+    from datetime import timedelta
+    from sqlalchemy import insert, func
+    from database import (
+        engine, SessionLocal, create_tables, VICAccessLogs, refresh_analytics_aggregates, prune_vic_access_logs,
+        get_vic_access_logs, list_vic_access_logs, list_share_access_daily
+    )
+    engine.echo = False
+
+    create_tables()
+    rng = random.Random(42)
+    tokens = [f"VIC_bench_{index:06d}" for index in range(args.shares)]
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(VICAccessLogs.id)).scalar()
+        now = datetime.utcnow()
+        # Oldest first, so ids follow created_at like real traffic
+        ages = sorted((rng.uniform(0, args.days) for _ in range(max(args.logs - existing, 0))), reverse=True)
+        for start in range(0, len(ages), 10_000):
+            shares = [rng.randrange(args.shares) for _ in ages[start:start + 10_000]]
+            # Shares are mostly read by the one hospital they were shared with
+            db.execute(insert(VICAccessLogs), [{
+                'share_token': tokens[share],
+                'accessed_by_hospital': f"Rumah Sakit {share % 20 if rng.random() < 0.9 else rng.randrange(20)}",
+                'accessed_data': '#31',
+                'created_at': now - timedelta(days=age)
+            } for share, age in zip(shares, ages[start:start + 10_000])])
+            db.commit()
+        start = time.perf_counter()
+        refresh_analytics_aggregates(db, batch_size=50_000)
+        print(f"🗂️  {args.logs:,} access logs over {args.days} days, {args.shares:,} shares "
+              f"(rollups folded in {time.perf_counter() - start:.1f}s)")
+        sample = rng.sample(tokens, min(args.lookups, len(tokens)))
+
+        def measure(label, lookup):
+            start = time.perf_counter()
+            rows = sum(len(lookup(token)) for token in sample)
+            elapsed = time.perf_counter() - start
+            print(f"⏱️  {label:<36} {elapsed / len(sample) * 1000:>7.2f} ms/share ({rows / len(sample):,.0f} rows)")
+
+        measure("all raw logs (ORM, previous endpoint)", lambda token: get_vic_access_logs(db, share_token=token))
+        measure("latest 100 + daily rollups",
+                lambda token: list_vic_access_logs(db, share_token=token, limit=100) + list_share_access_daily(db, token))
+        start = time.perf_counter()
+        removed = prune_vic_access_logs(db, retention_days=args.retention)
+        print(f"✂️  Pruned {removed:,} raw logs older than {args.retention} days in {time.perf_counter() - start:.1f}s")
+        measure("latest 100 + daily rollups, pruned",
+                lambda token: list_vic_access_logs(db, share_token=token, limit=100) + list_share_access_daily(db, token))
+    finally:
+        db.close()
+
+def bench_access_log_partitions(args):
+    """MariaDB only: the monthly partition DDL on vic_access_logs, then retention by dropping partitions"""
+    import random
+    from datetime import timedelta
+    from sqlalchemy import insert, text
+    from database import (
+        engine, SessionLocal, create_tables, VICAccessLogs, ensure_access_log_partitions, prune_vic_access_logs,
+        refresh_analytics_aggregates
+    )
+    engine.echo = False
+    if engine.dialect.name not in ("mysql", "mariadb"):
+        raise SystemExit("access-log-partitions needs MariaDB (DATABASE_URL), not --sqlite")
+
+    def partition_count(connection):
+        return connection.execute(text(
+            "SELECT COUNT(*) FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() "
+            "AND TABLE_NAME = 'vic_access_logs' AND PARTITION_NAME IS NOT NULL"
+        )).scalar()
+
+    create_tables()
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        # Start from an unpartitioned table holding the whole history, like a database from before partitioning
+        if partition_count(connection):
+            connection.execute(text("ALTER TABLE vic_access_logs REMOVE PARTITIONING"))
+        now = datetime.utcnow()
+        ages = sorted((rng.uniform(0, args.days) for _ in range(args.logs)), reverse=True)
+        for start in range(0, len(ages), 10_000):
+            connection.execute(insert(VICAccessLogs), [{
+                'share_token': f"VIC_bench_{rng.randrange(args.shares):06d}",
+                'accessed_by_hospital': f"Rumah Sakit {rng.randrange(20)}",
+                'accessed_data': '#31',
+                'created_at': now - timedelta(days=age)
+            } for age in ages[start:start + 10_000]])
+        total = connection.execute(text("SELECT COUNT(*) FROM vic_access_logs")).scalar()
+
+    with engine.begin() as connection:
+        start = time.perf_counter()
+        added = ensure_access_log_partitions(connection, initial=True)
+        print(f"🧱 PARTITION BY RANGE COLUMNS(created_at): {added} monthly partitions over {total:,} rows "
+              f"in {time.perf_counter() - start:.1f}s")
+    with engine.begin() as connection:
+        start = time.perf_counter()
+        added = ensure_access_log_partitions(connection, ahead=args.ahead)
+        print(f"🧱 REORGANIZE PARTITION pmax: {added} more future months in {time.perf_counter() - start:.2f}s "
+              f"({partition_count(connection)} partitions)")
+    db = SessionLocal()
+    try:
+        refresh_analytics_aggregates(db, batch_size=50_000)  # Only folded rows are pruned
+        start = time.perf_counter()
+        removed = prune_vic_access_logs(db, retention_days=args.retention)
+        print(f"✂️  Pruned {removed:,} rows older than {args.retention} days in {time.perf_counter() - start:.2f}s "
+              f"({partition_count(db.connection())} partitions left)")
+    finally:
+        db.close()
+
+def bench_share_expiry(args):
+    import random
+    from datetime import timedelta
+    from sqlalchemy import insert, func
+    from database import (
+        engine, SessionLocal, create_tables, VICShares, expire_vic_shares, get_vic_shares_by_patient,
+        list_vic_shares_by_patient, SHARE_ACTIVE, SHARE_REVOKED
+    )
+    engine.echo = False
+
+    create_tables()
+    rng = random.Random(7)
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(VICShares.id)).scalar()
+        now = datetime.utcnow()
+        rows = []
+        for index in range(existing, args.patients * args.shares):
+            revoked = rng.random() < args.revoked
+            # Most time-limited shares are long past their deadline; the sweeper has never run
+            expires_at = now + timedelta(hours=rng.uniform(-24 * 365, 24 * 30)) if rng.random() < args.expiring else None
+            rows.append({
+                'share_token': f"VIC_bench_{index:08d}", 'original_transaction_hash': f"0x{index:040x}",
+                'patient_id': f"BENCH{index % args.patients:06d}", 'shared_by': "bench",
+                'access_permissions': '#15', 'expires_at': expires_at, 'is_active': not revoked,
+                'status': SHARE_REVOKED if revoked else SHARE_ACTIVE,
+                'created_at': now - timedelta(days=rng.uniform(0, 730))
+            })
+            if len(rows) == 10_000:
+                db.execute(insert(VICShares), rows)
+                db.commit()
+                rows = []
+        if rows:
+            db.execute(insert(VICShares), rows)
+            db.commit()
+        patients = [f"BENCH{index:06d}" for index in rng.sample(range(args.patients), min(args.lookups, args.patients))]
+        print(f"🔗 {args.patients * args.shares:,} shares for {args.patients:,} patients")
+
+        def live_shares_before(patient_id):
+            # Previous listing: every share of the patient, live ones picked out per row
+            check = datetime.utcnow()
+            return [share for share in get_vic_shares_by_patient(db, patient_id)
+                    if share.is_active and not (share.expires_at and share.expires_at <= check)]
+
+        def measure(label, lookup):
+            start = time.perf_counter()
+            found = sum(len(lookup(patient_id)) for patient_id in patients)
+            elapsed = time.perf_counter() - start
+            print(f"⏱️  {label:<34} {elapsed / len(patients) * 1000:>6.2f} ms/patient ({found / len(patients):,.1f} live)")
+            return found
+
+        before = measure("all shares + per-row expiry check", live_shares_before)
+        start = time.perf_counter()
+        expired = expire_vic_shares(db)
+        print(f"🧹 Sweeper marked {expired:,} shares expired in {time.perf_counter() - start:.2f}s")
+        after = measure("active-status index", lambda patient_id: list_vic_shares_by_patient(db, patient_id))
+        if before != after:
+            raise SystemExit("Live share listings differ")
+    finally:
+        db.close()
+
+def bench_bulk_shares(args):
+    import secrets
+    from database import (
+        engine, SessionLocal, create_tables, create_vic_share, create_vic_shares, revoke_vic_share, revoke_vic_shares
+    )
+    engine.echo = False
+
+    create_tables()
+    print(f"🔗 {args.rounds} rounds of sharing {args.shares} VICs with one hospital, then revoking them")
+
+    def share_rows(patient_id):
+        return [{
+            'share_token': 'VIC_' + secrets.token_urlsafe(32), 'original_transaction_hash': f"0x{index:040x}",
+            'patient_id': patient_id, 'shared_by': patient_id, 'shared_with_hospital': "Rumah Sakit 1",
+            'access_permissions': '#15', 'expires_at': None, 'is_active': True
+        } for index in range(args.shares)]
+
+    def per_token(patient_id):
+        # Previous API: one create call and one revoke call per share, each with its own commit
+        db = SessionLocal()
+        try:
+            shares = share_rows(patient_id)
+            start = time.perf_counter()
+            for share_data in shares:
+                create_vic_share(db, share_data)
+            created = time.perf_counter()
+            for share_data in shares:
+                revoke_vic_share(db, share_data['share_token'])
+            return created - start, time.perf_counter() - created
+        finally:
+            db.close()
+
+    def bulk(patient_id):
+        db = SessionLocal()
+        try:
+            shares = share_rows(patient_id)
+            start = time.perf_counter()
+            create_vic_shares(db, shares)
+            created = time.perf_counter()
+            revoked = revoke_vic_shares(db, patient_id=patient_id, hospital="Rumah Sakit 1")
+            if len(revoked) != len(shares):
+                raise SystemExit(f"Bulk revoke hit {len(revoked)} of {len(shares)} shares")
+            return created - start, time.perf_counter() - created
+        finally:
+            db.close()
+
+    baseline = None
+    for label, run in (("per-token create/revoke", per_token), ("bulk create/revoke", bulk)):
+        timings = [run(f"BULK-{label.split()[0]}-{secrets.token_hex(4)}") for _ in range(args.rounds)]
+        create, revoke = min(t[0] for t in timings), min(t[1] for t in timings)
+        baseline = baseline or create + revoke
+        print(f"⏱️  {label:<24} create {create * 1000:>8.1f} ms, revoke {revoke * 1000:>8.1f} ms "
+              f"({baseline / (create + revoke):5.1f}x)")
+
+def bench_share_listing(args):
+    import random
+    import secrets
+    from sqlalchemy import select
+    from database import (
+        engine, SessionLocal, read_session, VICIssuance, create_vic_shares, get_vic_shares_by_patient,
+        list_vic_shares_by_patient
+    )
+    from api_server import VIC_SHARE_ROW, VIC_SUMMARY_ROW
+    from verify_service import verify_transaction
+    engine.echo = False
+
+    seed_vic_issuances(args.vics)
+    rng = random.Random(3)
+    patient_id = f"LISTING-{secrets.token_hex(4)}"
+    db = SessionLocal()
+    try:
+        hashes = db.execute(select(VICIssuance.transaction_hash).limit(args.vics)).scalars().all()
+        create_vic_shares(db, [{
+            'share_token': 'VIC_' + secrets.token_urlsafe(32), 'original_transaction_hash': rng.choice(hashes),
+            'patient_id': patient_id, 'shared_by': patient_id, 'shared_with_hospital': "Rumah Sakit 1",
+            'access_permissions': '#15'
+        } for _ in range(args.shares)])
+    finally:
+        db.close()
+    print(f"📱 Patient with {args.shares:,} shares, first page of {args.page}")
+
+    def before():
+        # Every share, then one verify call per share to show what it refers to
+        db = SessionLocal()
+        try:
+            shares = [VIC_SHARE_ROW(share) for share in get_vic_shares_by_patient(db, patient_id)]
+            return shares, [verify_transaction(db, share['original_transaction_hash'])['data'] for share in shares[:args.page]]
+        finally:
+            db.close()
+
+    def after():
+        with read_session() as db:
+            rows = list_vic_shares_by_patient(db, patient_id, limit=args.page + 1, with_vic=True)[:args.page]
+            return list(map(VIC_SHARE_ROW, rows)), list(map(VIC_SUMMARY_ROW, rows))
+
+    for label, run in (("all shares + verify per share", before), ("one page with embedded VICs", after)):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            shares, vics = run()
+            timings.append(time.perf_counter() - start)
+        print(f"⏱️  {label:<30} {min(timings) * 1000:>8.1f} ms ({len(shares):,} shares, "
+              f"{len(vics):,} VIC summaries, {1 + len(vics) if run is before else 1} queries)")
+
+def main():
+    parser = argparse.ArgumentParser(description="DID blockchain server benchmarks")
+    parser.add_argument("--sqlite", metavar="PATH", help="Run against a local SQLite (WAL) file instead of DATABASE_URL")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analytics = subparsers.add_parser("analytics", help="Vectorized ledger analytics vs Python loops")
+    analytics.add_argument("--rows", type=int, default=1_000_000, help="Synthetic VIC issuances")
+    analytics.add_argument("--from-db", action="store_true", help="Load from DATABASE_URL instead of synthetic data")
+    analytics.add_argument("--chunksize", type=int, default=100_000, help="read_sql chunk size")
+    analytics.add_argument("--skip-loop", action="store_true", help="Skip the Python loop baseline")
+    analytics.set_defaults(func=bench_analytics)
+
+    verify_load = subparsers.add_parser("verify-load", help="Load generator for the verify service")
+    verify_load.add_argument("--url", default="http://localhost:8505", help="Verify service base URL")
+    verify_load.add_argument("--api-url", default="http://localhost:8502", help="API server used to sample hashes")
+    verify_load.add_argument("--hash", action="append", help="Transaction hash to verify (repeatable)")
+    verify_load.add_argument("--sample", type=int, default=1000, help="Hashes sampled from the API server")
+    verify_load.add_argument("--concurrency", type=int, default=32, help="Concurrent client threads")
+    verify_load.add_argument("--requests", type=int, default=10_000, help="Total requests")
+    verify_load.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout (seconds)")
+    verify_load.set_defaults(func=bench_verify_load)
+
+    chain_stress = subparsers.add_parser("chain-stress", help="Parallel issuances with competing sealers; checks the chain")
+    chain_stress.add_argument("--issuances", type=int, default=5000, help="Total VIC issuances")
+    chain_stress.add_argument("--threads", type=int, default=64, help="Concurrent submitting threads")
+    chain_stress.add_argument("--sealers", type=int, default=8, help="Competing in-process block sealers")
+    chain_stress.add_argument("--block-size", type=int, default=20, help="Max transactions per block")
+    chain_stress.add_argument("--url", help="Issue through this API server instead (its block producer seals)")
+    chain_stress.add_argument("--drain-timeout", type=float, default=60.0, help="Seconds to wait for the server to seal")
+    chain_stress.set_defaults(func=bench_chain_stress)
+
+    sequencer = subparsers.add_parser("sequencer", help="Single-writer group-commit sequencer vs lock-based appends")
+    sequencer.add_argument("--issuances", type=int, default=5000, help="VIC issuances per variant")
+    sequencer.add_argument("--concurrency", type=int, default=64, help="Concurrent issuers")
+    sequencer.add_argument("--max-batch", type=int, default=100, help="Sequencer transactions per block")
+    sequencer.add_argument("--skip-lock", action="store_true", help="Skip the lock-based baseline")
+    sequencer.set_defaults(func=bench_sequencer)
+
+    group_commit = subparsers.add_parser("group-commit", help="Group-committed writes vs one commit per write")
+    group_commit.add_argument("--writes", type=int, default=5000, help="Writes per variant")
+    group_commit.add_argument("--threads", type=int, default=64, help="Concurrent writer threads")
+    group_commit.add_argument("--max-delay-ms", type=float, default=2.0, help="Group commit collection window")
+    group_commit.add_argument("--max-batch", type=int, default=256, help="Max writes per commit")
+    group_commit.add_argument("--skip-direct", action="store_true", help="Skip the commit-per-write baseline")
+    group_commit.set_defaults(func=bench_group_commit)
+
+    chain_memory = subparsers.add_parser("chain-memory", help="Memory of a loaded chain: dict transactions vs columnar")
+    chain_memory.add_argument("--transactions", type=int, default=1_000_000, help="Synthetic transactions in the chain")
+    chain_memory.add_argument("--block-size", type=int, default=100, help="Transactions per block")
+    chain_memory.add_argument("--skip-dicts", action="store_true", help="Skip the list-of-dicts baseline")
+    chain_memory.set_defaults(func=bench_chain_memory)
+
+    compact_columns = subparsers.add_parser("compact-columns", help="Bitmask share/access-log columns vs JSON copies")
+    compact_columns.add_argument("--shares", type=int, default=20_000, help="Synthetic VIC shares")
+    compact_columns.add_argument("--accesses", type=int, default=200_000, help="Synthetic access logs")
+    compact_columns.set_defaults(func=bench_compact_columns)
+
+    payload_storage = subparsers.add_parser("payload-storage", help="Bytes per VIC: inline copies vs payload store")
+    payload_storage.add_argument("--issuances", type=int, default=20_000, help="Synthetic VIC issuances")
+    payload_storage.add_argument("--duplicates", type=float, default=0.05, help="Share of resubmitted payloads")
+    payload_storage.set_defaults(func=bench_payload_storage)
+
+    serialization = subparsers.add_parser("serialization", help="List endpoint serialization: projections + orjson")
+    serialization.add_argument("--rows", type=int, default=10_000, help="Rows in the response")
+    serialization.add_argument("--repeat", type=int, default=5, help="Runs per variant")
+    serialization.set_defaults(func=bench_serialization)
+
+    read_paths = subparsers.add_parser("read-paths", help="List/verify reads: ORM entities vs column rows")
+    read_paths.add_argument("--rows", type=int, default=10_000, help="VIC rows listed")
+    read_paths.add_argument("--lookups", type=int, default=1000, help="Verify lookups by transaction hash")
+    read_paths.add_argument("--repeat", type=int, default=3, help="Runs per variant")
+    read_paths.set_defaults(func=bench_read_paths)
+
+    read_replica = subparsers.add_parser("read-replica", help="Issuance under verify load: reads on primary vs replica")
+    read_replica.add_argument("--replica", metavar="PATH", help="Replica SQLite file (default: <primary>-replica.db)")
+    read_replica.add_argument("--rows", type=int, default=5000, help="VICs seeded before replication")
+    read_replica.add_argument("--writes", type=int, default=500, help="Issuances per run")
+    read_replica.add_argument("--writers", type=int, default=4, help="Issuing threads")
+    read_replica.add_argument("--readers", type=int, default=4, help="Verifying processes")
+    read_replica.set_defaults(func=bench_read_replica)
+
+    access_logs = subparsers.add_parser("access-logs", help="Share access history: raw log scan vs rollups + retention")
+    access_logs.add_argument("--logs", type=int, default=200_000, help="Access log rows")
+    access_logs.add_argument("--shares", type=int, default=500, help="Distinct share tokens")
+    access_logs.add_argument("--days", type=int, default=730, help="History length in days")
+    access_logs.add_argument("--retention", type=int, default=90, help="Raw log retention in days")
+    access_logs.add_argument("--lookups", type=int, default=50, help="Shares looked up per variant")
+    access_logs.set_defaults(func=bench_access_logs)
+
+    partitions = subparsers.add_parser("access-log-partitions",
+                                       help="MariaDB: monthly partition DDL on vic_access_logs and partition drops")
+    partitions.add_argument("--logs", type=int, default=200_000, help="Access log rows")
+    partitions.add_argument("--shares", type=int, default=500, help="Distinct share tokens")
+    partitions.add_argument("--days", type=int, default=730, help="History length in days")
+    partitions.add_argument("--ahead", type=int, default=12, help="Future months to split out of pmax")
+    partitions.add_argument("--retention", type=int, default=90, help="Raw log retention in days")
+    partitions.set_defaults(func=bench_access_log_partitions)
+
+    share_expiry = subparsers.add_parser("share-expiry", help="Live share listing: per-row expiry vs sweeper + index")
+    share_expiry.add_argument("--patients", type=int, default=2000, help="Patients")
+    share_expiry.add_argument("--shares", type=int, default=50, help="Shares per patient")
+    share_expiry.add_argument("--expiring", type=float, default=0.8, help="Fraction of shares with an expiry")
+    share_expiry.add_argument("--revoked", type=float, default=0.1, help="Fraction of revoked shares")
+    share_expiry.add_argument("--lookups", type=int, default=200, help="Patients listed per variant")
+    share_expiry.set_defaults(func=bench_share_expiry)
+
+    bulk_shares = subparsers.add_parser("bulk-shares", help="Share/revoke many VICs: per-token calls vs bulk statements")
+    bulk_shares.add_argument("--shares", type=int, default=200, help="Shares per round")
+    bulk_shares.add_argument("--rounds", type=int, default=3, help="Rounds per variant")
+    bulk_shares.set_defaults(func=bench_bulk_shares)
+
+    share_listing = subparsers.add_parser("share-listing", help="Patient share screen: listing + verify per share vs one page")
+    share_listing.add_argument("--vics", type=int, default=2000, help="VICs to share from")
+    share_listing.add_argument("--shares", type=int, default=500, help="Shares of the patient")
+    share_listing.add_argument("--page", type=int, default=50, help="Shares shown per screen")
+    share_listing.add_argument("--repeat", type=int, default=5, help="Runs per variant")
+    share_listing.set_defaults(func=bench_share_listing)
+
+    args = parser.parse_args()
+    if args.sqlite:
+        # Must be set before database.py is imported by the subcommand
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.sqlite)}"
+    print(f"🚀 Benchmark: {args.command} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+    print("=" * 70)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
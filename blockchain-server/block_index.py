@@ -0,0 +1,194 @@
+"""
+Memory-mapped fixed-width block index
+
+Optional (enabled with BLOCK_INDEX_DIR). `headers.bin` holds one 104-byte
+record per block, at position index - 1:
+
+    block index | block row id | hash | previous hash | timestamp | tx start | tx count | nonce
+
+with hashes stored as raw 32-byte digests. `tx_hashes.bin` holds the raw
+20-byte transaction hashes of every block in chain order; a header's
+[tx start, tx start + tx count) range points into it. Both files are only
+ever appended and are read through read-only mmaps, so header and
+transaction-hash lookups are a memoryview slice (no ORM round trip, no
+per-row objects) and every worker process shares the same page cache.
+
+The API server appends to the index after each sealed block
+(sync_from_database); readers such as the verify service only map it.
+"""
+import mmap
+import os
+import struct
+import threading
+from database import Block, Transaction
+from block_log import FileLock
+
+BLOCK_INDEX_DIR = os.getenv("BLOCK_INDEX_DIR")
+
+HEADER = struct.Struct('<QQ32s32sdQII')
+TX_HASH_SIZE = 20
+GENESIS_PREVIOUS_HASH = "0"
+
+def _digest(hex_hash, size):
+    value = hex_hash[2:] if hex_hash.startswith('0x') else hex_hash
+    if value == GENESIS_PREVIOUS_HASH:
+        return bytes(size)
+    digest = bytes.fromhex(value)
+    if len(digest) != size:
+        raise ValueError(f"Unexpected hash length: {hex_hash}")
+    return digest
+
+class MappedFile:
+    """Append-only file read through a read-only mmap that is remapped as it grows"""
+
+    def __init__(self, path, record_size):
+        self.path = path
+        self.record_size = record_size
+        self._map = None
+        self._view = memoryview(b'')
+        self._lock = threading.Lock()
+        open(path, 'ab').close()
+
+    def view(self, end=None):
+        """memoryview over all complete records (at least `end` bytes when available)"""
+        if end is not None and len(self._view) >= end:
+            return self._view
+        with self._lock:
+            size = os.path.getsize(self.path)
+            size -= size % self.record_size
+            if size > len(self._view):
+                with open(self.path, 'rb') as f:
+                    new_map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                # Old views may still be referenced by callers; leave the old map to the GC
+                self._map = new_map
+                self._view = memoryview(new_map)
+            return self._view
+
+    @property
+    def count(self):
+        return len(self.view()) // self.record_size
+
+class BlockIndex:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.headers = MappedFile(os.path.join(directory, "headers.bin"), HEADER.size)
+        self.tx_hashes = MappedFile(os.path.join(directory, "tx_hashes.bin"), TX_HASH_SIZE)
+        self._lock_path = os.path.join(directory, "append.lock")
+        self._write_lock = threading.Lock()
+
+    @property
+    def tip(self):
+        """Highest indexed block (0 when empty)"""
+        return self.headers.count
+
+    def header_view(self, index):
+        """Zero-copy memoryview of a block's header record, or None"""
+        if index < 1:
+            return None
+        start = (index - 1) * HEADER.size
+        view = self.headers.view(start + HEADER.size)
+        if start + HEADER.size > len(view):
+            return None
+        return view[start:start + HEADER.size]
+
+    def header(self, index):
+        """Decoded header dict, or None"""
+        record = self.header_view(index)
+        if record is None:
+            return None
+        block_index, block_id, block_hash, previous_hash, timestamp, tx_start, tx_count, nonce = HEADER.unpack(record)
+        return {
+            'index': block_index,
+            'block_id': block_id,
+            'hash': block_hash.hex(),
+            'previous_hash': previous_hash.hex() if any(previous_hash) else GENESIS_PREVIOUS_HASH,
+            'timestamp': timestamp,
+            'nonce': nonce,
+            'transaction_count': tx_count
+        }
+
+    def transaction_hashes_view(self, index):
+        """Zero-copy memoryview of the block's concatenated 20-byte transaction hashes"""
+        record = self.header_view(index)
+        if record is None:
+            return None
+        tx_start, tx_count = struct.unpack_from('<QI', record, 88)
+        view = self.tx_hashes.view((tx_start + tx_count) * TX_HASH_SIZE)
+        return view[tx_start * TX_HASH_SIZE:(tx_start + tx_count) * TX_HASH_SIZE]
+
+    def transaction_hashes(self, index):
+        view = self.transaction_hashes_view(index)
+        if view is None:
+            return None
+        return ['0x' + view[i:i + TX_HASH_SIZE].hex() for i in range(0, len(view), TX_HASH_SIZE)]
+
+    def inclusion_proof(self, index, transaction_hash):
+        """Header plus the ordered transaction hashes of the block, and the transaction's position"""
+        header = self.header(index)
+        if header is None:
+            return None
+        view = self.transaction_hashes_view(index)
+        target = _digest(transaction_hash, TX_HASH_SIZE)
+        position = next((i // TX_HASH_SIZE for i in range(0, len(view), TX_HASH_SIZE)
+                         if view[i:i + TX_HASH_SIZE] == target), None)
+        if position is None:
+            return None
+        return dict(header, position=position, transaction_hashes=self.transaction_hashes(index))
+
+    def sync_from_database(self, db, batch_size=1000):
+        """Append headers for blocks sealed in the database but not yet indexed; returns the number appended"""
+        appended = 0
+        with self._write_lock, FileLock(self._lock_path):
+            self._truncate_torn_writes()
+            # Sizes from the files themselves: a mapping may predate a truncation
+            tip = os.path.getsize(self.headers.path) // HEADER.size
+            tx_next = os.path.getsize(self.tx_hashes.path) // TX_HASH_SIZE
+            while True:
+                blocks = db.query(Block).filter(Block.index > tip).order_by(Block.index.asc()).limit(batch_size).all()
+                if not blocks or blocks[0].index != tip + 1:
+                    break
+                hashes = {}
+                for block_id, transaction_hash in db.query(Transaction.block_id, Transaction.transaction_hash).filter(
+                    Transaction.block_id.in_([block.id for block in blocks])
+                ).order_by(Transaction.id.asc()):
+                    hashes.setdefault(block_id, []).append(_digest(transaction_hash, TX_HASH_SIZE))
+                headers, tx_data = bytearray(), bytearray()
+                for block in blocks:
+                    if block.index != tip + 1:
+                        break
+                    block_hashes = hashes.get(block.id, [])
+                    headers += HEADER.pack(block.index, block.id, _digest(block.hash, 32), _digest(block.previous_hash, 32),
+                                           block.timestamp, tx_next, len(block_hashes), block.nonce or 0)
+                    tx_data += b''.join(block_hashes)
+                    tx_next += len(block_hashes)
+                    tip = block.index
+                    appended += 1
+                # Transaction hashes first: a header only becomes visible once its range exists
+                with open(self.tx_hashes.path, 'ab') as f:
+                    f.write(tx_data)
+                with open(self.headers.path, 'ab') as f:
+                    f.write(headers)
+                if tip != blocks[-1].index:
+                    break
+        return appended
+
+    def _truncate_torn_writes(self):
+        for mapped in (self.headers, self.tx_hashes):
+            size = os.path.getsize(mapped.path)
+            if size % mapped.record_size:
+                with open(mapped.path, 'r+b') as f:
+                    f.truncate(size - size % mapped.record_size)
+        # Drop transaction hashes written for a header that never made it
+        expected = 0
+        header_bytes = os.path.getsize(self.headers.path)
+        if header_bytes:
+            with open(self.headers.path, 'rb') as f:
+                f.seek(header_bytes - HEADER.size)
+                tx_start, tx_count = struct.unpack_from('<QI', f.read(HEADER.size), 88)
+            expected = (tx_start + tx_count) * TX_HASH_SIZE
+        if os.path.getsize(self.tx_hashes.path) > expected:
+            with open(self.tx_hashes.path, 'r+b') as f:
+                f.truncate(expected)
+
+# Shared index for this process (None unless BLOCK_INDEX_DIR is set)
+block_index = BlockIndex(BLOCK_INDEX_DIR) if BLOCK_INDEX_DIR else None
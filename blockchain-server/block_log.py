@@ -0,0 +1,258 @@
+"""
+Append-only segmented block log
+
+Optional storage engine (enabled with BLOCK_LOG_DIR) holding every sealed
+block with its full transactions. Blocks are appended to segment files
+`<first index>.log` as length-prefixed, CRC-checked JSON records; a segment
+rolls over once it reaches BLOCK_LOG_SEGMENT_SIZE bytes. Each segment has a
+sparse `<first index>.idx` file with the byte offset of every
+BLOCK_LOG_INDEX_INTERVAL-th block, so a lookup by block index jumps straight
+to the right record neighbourhood and reads it through mmap.
+
+Change of plan from a log-first design: the relational `blocks` /
+`transactions` tables stay the write path for sealing (their unique block
+height is what serializes concurrent sealers across processes) and the
+secondary indexes for queries (by hash, patient, hospital). The log is a
+read store brought up to date from them with sync_from_database after each
+sealed block. Appends take an exclusive file lock, so any process may sync.
+Readers never take a lock: a segment map that has to grow is replaced, not
+closed, so a reader still holding the old one keeps a valid mapping.
+"""
+import bisect
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+from database import Block, Transaction, transaction_to_dict
+
+BLOCK_LOG_DIR = os.getenv("BLOCK_LOG_DIR")
+BLOCK_LOG_SEGMENT_SIZE = int(os.getenv("BLOCK_LOG_SEGMENT_SIZE", str(64 * 1024 * 1024)))
+BLOCK_LOG_INDEX_INTERVAL = int(os.getenv("BLOCK_LOG_INDEX_INTERVAL", "16"))
+BLOCK_LOG_FSYNC = os.getenv("BLOCK_LOG_FSYNC", "false").lower() == "true"
+
+RECORD_HEADER = struct.Struct('<IQI')  # payload length, block index, crc32 of payload
+
+class Segment:
+    """One segment file plus its sparse offset index"""
+
+    def __init__(self, directory, first_index):
+        self.first_index = first_index
+        self.path = os.path.join(directory, f"{first_index:012d}.log")
+        self.index_path = os.path.join(directory, f"{first_index:012d}.idx")
+        self.offsets = array('Q')  # offsets[k] -> record of block first_index + k * interval
+        self.last_index = first_index - 1
+        self.size = 0
+        self._map = None
+        self._map_lock = threading.Lock()
+
+    def load_offsets(self):
+        self.offsets = array('Q')
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            self.offsets.frombytes(data[:len(data) - len(data) % self.offsets.itemsize])
+
+    def view(self, end):
+        """Read-only mapping covering at least `end` bytes (remapped as the segment grows)"""
+        current = self._map
+        if current is not None and len(current) >= end:
+            return current
+        with self._map_lock:
+            if self._map is None or len(self._map) < end:
+                with open(self.path, 'rb') as f:
+                    # Other readers may still use the old map; leave it to the GC (as block_index.MappedFile does)
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+class BlockLog:
+    def __init__(self, directory, segment_size=BLOCK_LOG_SEGMENT_SIZE, index_interval=BLOCK_LOG_INDEX_INTERVAL,
+                 fsync=BLOCK_LOG_FSYNC):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.index_interval = index_interval
+        self.fsync = fsync
+        self._segments = []
+        self._firsts = []
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, "append.lock")
+        with self._lock, self._file_lock():
+            self._refresh(repair=True)
+
+    @property
+    def tip(self):
+        """Highest block index in the log (0 when empty)"""
+        return self._segments[-1].last_index if self._segments else 0
+
+    def _file_lock(self):
+        return FileLock(self._lock_path)
+
+    def _refresh(self, repair=False):
+        """Pick up segments and records appended since the last refresh (possibly by another process)"""
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.log'))
+        known = set(self._firsts)
+        # The previously last segment may have grown before another process rolled over
+        scan_from = max(len(self._segments) - 1, 0)
+        for name in names:
+            first_index = int(name[:-4])
+            if first_index not in known:
+                segment = Segment(self.directory, first_index)
+                segment.load_offsets()
+                self._segments.append(segment)
+                self._firsts.append(first_index)
+        for segment in self._segments[scan_from:]:
+            self._scan_tail(segment, repair, truncate=repair and segment is self._segments[-1])
+
+    def _scan_tail(self, segment, repair, truncate=False):
+        """Advance segment.last_index over complete records; on repair rebuild missing index entries"""
+        size = os.path.getsize(segment.path)
+        if segment.last_index >= segment.first_index:
+            offset = segment.size
+        elif segment.offsets:
+            # Resume from the last indexed record instead of the segment start
+            offset = segment.offsets[-1]
+            segment.last_index = segment.first_index + (len(segment.offsets) - 1) * self.index_interval - 1
+        else:
+            offset = 0
+        if offset >= size:
+            segment.size = offset
+            return
+        with open(segment.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        position = 0
+        while position + RECORD_HEADER.size <= len(data):
+            length, index, crc = RECORD_HEADER.unpack_from(data, position)
+            end = position + RECORD_HEADER.size + length
+            if end > len(data) or zlib.crc32(data[position + RECORD_HEADER.size:end]) != crc:
+                break
+            if repair:
+                self._index_record(segment, index, offset + position)
+            segment.last_index = index
+            position = end
+        segment.size = offset + position
+        if truncate and segment.size < size:
+            # Torn write from a crash: cut it off so the next append starts on a record boundary
+            with open(segment.path, 'r+b') as f:
+                f.truncate(segment.size)
+
+    def _index_record(self, segment, index, offset):
+        position = index - segment.first_index
+        if position % self.index_interval:
+            return
+        slot = position // self.index_interval
+        if slot < len(segment.offsets):
+            return
+        segment.offsets.append(offset)
+        with open(segment.index_path, 'ab') as f:
+            f.write(struct.pack('<Q', offset))
+
+    def append(self, block):
+        """Append a block dict; its index must directly follow the current tip"""
+        with self._lock, self._file_lock():
+            self._refresh()
+            self._append_locked(block)
+
+    def _append_locked(self, block):
+        if block['index'] != self.tip + 1:
+            raise ValueError(f"Block {block['index']} does not follow log tip {self.tip}")
+        payload = json.dumps(block, separators=(',', ':')).encode()
+        record = RECORD_HEADER.pack(len(payload), block['index'], zlib.crc32(payload)) + payload
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or (segment.size and segment.size + len(record) > self.segment_size):
+            segment = Segment(self.directory, block['index'])
+            self._segments.append(segment)
+            self._firsts.append(segment.first_index)
+        with open(segment.path, 'ab') as f:
+            f.write(record)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._index_record(segment, block['index'], segment.size)
+        segment.size += len(record)
+        segment.last_index = block['index']
+
+    def get(self, index):
+        """Block dict by block index, or None if it is not in the log"""
+        if index < 1:
+            return None
+        if index > self.tip:
+            with self._lock:
+                self._refresh()
+            if index > self.tip:
+                return None
+        segment = self._segments[bisect.bisect_right(self._firsts, index) - 1]
+        slot = (index - segment.first_index) // self.index_interval
+        if slot >= len(segment.offsets):
+            segment.load_offsets()
+        offset = segment.offsets[slot]
+        view = segment.view(segment.size)
+        # At most index_interval - 1 records to skip from the indexed one
+        while offset < segment.size:
+            length, record_index, _ = RECORD_HEADER.unpack_from(view, offset)
+            start = offset + RECORD_HEADER.size
+            if record_index == index:
+                return json.loads(view[start:start + length])
+            offset = start + length
+        return None
+
+    def sync_from_database(self, db, batch_size=500):
+        """Append blocks sealed in the database but not yet in the log; returns the number appended"""
+        appended = 0
+        with self._lock, self._file_lock():
+            self._refresh()
+            while True:
+                blocks = db.query(Block).filter(Block.index > self.tip).order_by(Block.index.asc()).limit(batch_size).all()
+                if not blocks or blocks[0].index != self.tip + 1:
+                    break  # Empty, or a gap that is still being filled by a concurrent sealer
+                transactions = {}
+                for tx in db.query(Transaction).filter(
+                    Transaction.block_id.in_([block.id for block in blocks])
+                ).order_by(Transaction.id.asc()):
+                    transactions.setdefault(tx.block_id, []).append(transaction_to_dict(tx))
+                for block in blocks:
+                    if block.index != self.tip + 1:
+                        return appended
+                    # Same record format as database.get_block_by_index
+                    self._append_locked({
+                        'index': block.index,
+                        'hash': block.hash,
+                        'previous_hash': block.previous_hash,
+                        'timestamp': block.timestamp,
+                        'nonce': block.nonce or 0,
+                        'transactions': transactions.get(block.id, [])
+                    })
+                    appended += 1
+        return appended
+
+    def close(self):
+        for segment in self._segments:
+            segment.close()
+
+class FileLock:
+    """Exclusive advisory lock shared by every process appending to the same log"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+
+# Shared log for this process (None unless BLOCK_LOG_DIR is set)
+block_log = BlockLog(BLOCK_LOG_DIR) if BLOCK_LOG_DIR else None
@@ -0,0 +1,380 @@
+"""
+Block dan Blockchain yang disimpan di tabel `blocks` / `transactions`
+
+Satu instance Blockchain dipakai bersama oleh semua session dalam satu proses.
+Header block dimuat saat start (dan secara inkremental setelahnya), sedangkan
+isi block (transaksi) baru dimuat dari database saat pertama kali dibaca.
+
+Block yang sudah dimuat menyimpan transaksinya secara kolumnar
+(TransactionColumns): kode type/hospital/alamat yang di-intern, angka di
+`array`, hash sebagai 20 byte mentah. Dict transaksi baru dibuat saat dibaca.
+"""
+import hashlib
+import json
+import sys
+import threading
+import time
+from array import array
+from typing import List, Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from database import (
+    SessionLocal, Block as BlockRecord, Transaction as TransactionRecord,
+    get_blocks_after, get_transactions_by_block, get_pending_transactions,
+    get_transactions_by_patient, get_address_balance, transaction_to_dict, encode_medical_data, save_transaction
+)
+from mempool import vic_issuance_from_transaction, BLOCK_APPEND_RETRIES
+from block_log import block_log
+from block_index import block_index
+
+def transaction_hash_for(transaction: Dict):
+    """Timestamp-salted transaction hash (same scheme as the API server)"""
+    payload = json.dumps(transaction, sort_keys=True, default=str).encode()
+    return '0x' + hashlib.sha256(payload + str(transaction['timestamp']).encode()).hexdigest()[:40]
+
+class CodeTable:
+    """Interns repeated strings (types, hospitals, addresses) as small integer codes; code 0 is None"""
+    __slots__ = ('_codes', 'values', '_lock')
+
+    def __init__(self):
+        self._codes = {}
+        self.values = [None]
+        self._lock = threading.Lock()
+
+    def code(self, value):
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(sys.intern(value))
+                    self._codes[self.values[code]] = code
+        return code
+
+    def __len__(self):
+        return len(self.values) - 1
+
+# Shared by every block of the process, so each distinct string is stored once
+TRANSACTION_TYPES = CodeTable()
+HOSPITALS = CodeTable()
+ADDRESSES = CodeTable()  # from/to addresses and patient ids
+
+TX_HASH_SIZE = 20
+
+class TransactionColumns:
+    """Columnar storage for the transactions of one block (same dicts as transaction_to_dict on read)"""
+    __slots__ = ('hashes', 'odd_hashes', 'from_codes', 'to_codes', 'patient_codes', 'type_codes',
+                 'hospital_codes', 'amounts', 'timestamps', 'medical_data', 'medical_data_ends')
+
+    def __init__(self):
+        self.hashes = bytearray()  # Raw 20-byte digests of '0x' + 40 lowercase hex hashes
+        self.odd_hashes = None  # {position: hash} for hashes in any other format
+        self.from_codes = array('I')
+        self.to_codes = array('I')
+        self.patient_codes = array('I')
+        self.type_codes = array('H')
+        self.hospital_codes = array('H')
+        self.amounts = array('d')
+        self.timestamps = array('d')
+        self.medical_data = bytearray()  # Concatenated compact JSON, decoded on read
+        self.medical_data_ends = array('I')  # End offset per transaction; empty range means None
+
+    @classmethod
+    def from_dicts(cls, transactions):
+        columns = cls()
+        for transaction in transactions:
+            columns.append(transaction)
+        return columns
+
+    def append(self, transaction):
+        transaction_hash = transaction['transaction_hash']
+        try:
+            digest = bytes.fromhex(transaction_hash[2:])
+        except ValueError:
+            digest = None
+        # Only hashes that read back byte-for-byte (no uppercase hex, no whitespace) go in the compact column
+        if digest is None or len(digest) != TX_HASH_SIZE or transaction_hash != '0x' + digest.hex():
+            if self.odd_hashes is None:
+                self.odd_hashes = {}
+            self.odd_hashes[len(self)] = transaction_hash
+            digest = bytes(TX_HASH_SIZE)
+        self.hashes += digest
+        self.from_codes.append(ADDRESSES.code(transaction.get('from')))
+        self.to_codes.append(ADDRESSES.code(transaction.get('to')))
+        self.patient_codes.append(ADDRESSES.code(transaction.get('patient_id')))
+        self.type_codes.append(TRANSACTION_TYPES.code(transaction.get('type')))
+        self.hospital_codes.append(HOSPITALS.code(transaction.get('hospital')))
+        self.amounts.append(transaction.get('amount') or 0)
+        self.timestamps.append(transaction['timestamp'])
+        medical_data = transaction.get('medical_data')
+        if medical_data is not None:
+            self.medical_data += json.dumps(medical_data, separators=(',', ':')).encode()
+        self.medical_data_ends.append(len(self.medical_data))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        if self.odd_hashes is not None and position in self.odd_hashes:
+            transaction_hash = self.odd_hashes[position]
+        else:
+            transaction_hash = '0x' + self.hashes[position * TX_HASH_SIZE:(position + 1) * TX_HASH_SIZE].hex()
+        start = self.medical_data_ends[position - 1] if position else 0
+        medical_data = self.medical_data[start:self.medical_data_ends[position]]
+        return {
+            'transaction_hash': transaction_hash,
+            'from': ADDRESSES.values[self.from_codes[position]],
+            'to': ADDRESSES.values[self.to_codes[position]],
+            'amount': self.amounts[position],
+            'type': TRANSACTION_TYPES.values[self.type_codes[position]],
+            'hospital': HOSPITALS.values[self.hospital_codes[position]],
+            'patient_id': ADDRESSES.values[self.patient_codes[position]],
+            'medical_data': json.loads(medical_data) if medical_data else None,
+            'timestamp': self.timestamps[position]
+        }
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+# Kelas untuk Block
+class Block:
+    # No per-instance __dict__: a loaded chain keeps one of these per block
+    __slots__ = ('index', '_transactions', 'timestamp', 'previous_hash', 'nonce', 'block_id', 'hash')
+
+    def __init__(self, index: int, transactions: Optional[List[Dict]], previous_hash: str, timestamp: float = None,
+                 block_id: int = None, hash: str = None, nonce: int = 0):
+        self.index = index
+        self._transactions = transactions
+        self.timestamp = timestamp or time.time()
+        self.previous_hash = previous_hash
+        self.nonce = nonce
+        self.block_id = block_id
+        self.hash = hash or self.calculate_hash()
+
+    @classmethod
+    def from_record(cls, record):
+        """Header-only block; transactions are loaded on first access"""
+        return cls(record.index, None, record.previous_hash, record.timestamp,
+                   block_id=record.id, hash=record.hash, nonce=record.nonce or 0)
+
+    @property
+    def transactions(self):
+        """Transaction dicts; loaded blocks keep them columnar and build the dicts on each read"""
+        if self._transactions is None and block_log is not None:
+            record = block_log.get(self.index)
+            if record is not None:
+                self._transactions = TransactionColumns.from_dicts(record['transactions'])
+        if self._transactions is None:
+            db = SessionLocal()
+            try:
+                self._transactions = TransactionColumns.from_dicts(
+                    transaction_to_dict(tx) for tx in get_transactions_by_block(db, self.block_id)
+                )
+            finally:
+                db.close()
+        if isinstance(self._transactions, TransactionColumns):
+            return list(self._transactions)
+        return self._transactions
+
+    def calculate_hash(self):
+        block_string = f"{self.index}{self.transactions}{self.timestamp}{self.previous_hash}{self.nonce}"
+        return hashlib.sha256(block_string.encode()).hexdigest()
+
+    def mine_block(self, difficulty: int = 2):
+        target = "0" * difficulty
+        while self.hash[:difficulty] != target:
+            self.nonce += 1
+            self.hash = self.calculate_hash()
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'transactions': self.transactions,
+            'timestamp': self.timestamp,
+            'previous_hash': self.previous_hash,
+            'hash': self.hash,
+            'nonce': self.nonce
+        }
+
+# Kelas untuk Blockchain
+class Blockchain:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.difficulty = 2
+        self._chain = []
+        self._last_block_id = 0
+        self._lock = threading.Lock()
+        self.load_chain()
+
+    def load_chain(self):
+        """Load block headers added since the last call"""
+        if block_index is not None:
+            return self._load_chain_from_index()
+        with self._lock:
+            db = self.session_factory()
+            try:
+                records = get_blocks_after(db, self._last_block_id)
+            finally:
+                db.close()
+            for record in records:
+                self._chain.append(Block.from_record(record))
+                self._last_block_id = max(self._last_block_id, record.id)
+            self._chain.sort(key=lambda block: block.index)
+
+    def _load_chain_from_index(self):
+        """Append headers from the mmap block index instead of querying the blocks table"""
+        with self._lock:
+            db = self.session_factory()
+            try:
+                block_index.sync_from_database(db)
+            finally:
+                db.close()
+            for index in range(len(self._chain) + 1, block_index.tip + 1):
+                header = block_index.header(index)
+                self._chain.append(Block(index, None, header['previous_hash'], header['timestamp'],
+                                         block_id=header['block_id'], hash=header['hash'], nonce=header['nonce']))
+
+    @property
+    def chain(self):
+        self.load_chain()
+        return self._chain
+
+    @property
+    def pending_transactions(self):
+        db = self.session_factory()
+        try:
+            return [transaction_to_dict(tx) for tx in get_pending_transactions(db)]
+        finally:
+            db.close()
+
+    def add_transaction(self, transaction: Dict):
+        """Persist a pending transaction (block_id NULL until mined)"""
+        transaction_hash = transaction.get('transaction_hash') or transaction_hash_for(transaction)
+        db = self.session_factory()
+        try:
+            save_transaction(db, {
+                'block_id': None,
+                'transaction_hash': transaction_hash,
+                'from_address': transaction.get('from'),
+                'to_address': transaction['to'],
+                'amount': transaction.get('amount', 0),
+                'transaction_type': transaction['type'],
+                'hospital': transaction.get('hospital'),
+                'patient_id': transaction.get('patient_id'),
+                'medical_data': encode_medical_data(transaction['medical_data']) if transaction.get('medical_data') is not None else None,
+                'timestamp': transaction['timestamp']
+            })
+        finally:
+            db.close()
+        return dict(transaction, transaction_hash=transaction_hash)
+
+    def mine_pending_transactions(self, mining_reward_address: str = "system"):
+        mined = None
+        with self._lock:
+            for _ in range(BLOCK_APPEND_RETRIES):
+                try:
+                    mined = self._mine_block(mining_reward_address)
+                except IntegrityError:
+                    # Another process appended this block height first; mine on the new tip
+                    continue
+                if mined is not None:
+                    break
+        if not mined:
+            return False
+        if block_log is not None:
+            db = self.session_factory()
+            try:
+                block_log.sync_from_database(db)
+            finally:
+                db.close()
+        self.load_chain()
+        return True
+
+    def _mine_block(self, mining_reward_address):
+        """Mine pending transactions onto the current tip; None when they were claimed meanwhile"""
+        db = self.session_factory()
+        try:
+            pending = get_pending_transactions(db)
+            if not pending:
+                return False
+
+            # Tambahkan reward untuk miner
+            reward_transaction = {
+                'from': None,
+                'to': mining_reward_address,
+                'amount': 1,
+                'type': 'mining_reward',
+                'timestamp': time.time()
+            }
+            reward_transaction['transaction_hash'] = transaction_hash_for(reward_transaction)
+
+            tip = db.query(BlockRecord).order_by(BlockRecord.index.desc()).first()
+            block = Block(
+                tip.index + 1 if tip else 1,
+                [transaction_to_dict(tx) for tx in pending] + [reward_transaction],
+                tip.hash if tip else "0"
+            )
+            block.mine_block(self.difficulty)
+
+            record = BlockRecord(
+                index=block.index,
+                timestamp=block.timestamp,
+                previous_hash=block.previous_hash,
+                hash=block.hash,
+                nonce=block.nonce
+            )
+            db.add(record)
+            db.flush()
+
+            # Only claim rows that are still pending; the block producer may have sealed them
+            claimed = db.query(TransactionRecord).filter(
+                TransactionRecord.id.in_([tx.id for tx in pending]),
+                TransactionRecord.block_id.is_(None)
+            ).update({TransactionRecord.block_id: record.id}, synchronize_session=False)
+            if claimed != len(pending):
+                db.rollback()
+                return None
+            for tx in pending:
+                if tx.transaction_type == 'vic_issuance':
+                    vic = vic_issuance_from_transaction(tx, block.index)
+                    if vic is not None:
+                        db.add(vic)
+            db.add(TransactionRecord(
+                block_id=record.id,
+                transaction_hash=reward_transaction['transaction_hash'],
+                from_address=None,
+                to_address=mining_reward_address,
+                amount=1,
+                transaction_type='mining_reward',
+                timestamp=reward_transaction['timestamp']
+            ))
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def get_balance(self, address: str):
+        db = self.session_factory()
+        try:
+            return get_address_balance(db, address)
+        finally:
+            db.close()
+
+    def get_patient_transactions(self, patient_id: str, transaction_type: str = 'vic_issuance'):
+        db = self.session_factory()
+        try:
+            return [transaction_to_dict(tx) for tx in get_transactions_by_patient(db, patient_id, transaction_type)]
+        finally:
+            db.close()
+
+    def get_chain(self):
+        return [block.to_dict() for block in self.chain]
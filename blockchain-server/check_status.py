@@ -53,6 +53,11 @@ def check_api_endpoints():
         except Exception as e:
             print(f"❌ Transactions API: {str(e)}")
 
+def check_verify_service():
+    """Check standalone verify service"""
+    print("\n🔍 Checking Verify Service...")
+    check_service("http://localhost:8505/health", "Verify Service (Port 8505)")
+
 def check_streamlit():
     """Check Streamlit interface"""
     print("\n🔍 Checking Streamlit Interface...")
@@ -81,10 +86,14 @@ def main():
     # Check API
     check_api_endpoints()
     
+    # Check verify service
+    check_verify_service()
+    
     print("\n" + "=" * 50)
     print("📋 Access URLs:")
     print("🌐 Streamlit UI: http://localhost:8501")
     print("🔗 API Server: http://localhost:8502")
+    print("🔍 Verify Service: http://localhost:8505/verify/<transaction_hash>")
     print("📊 VIC Issuances: http://localhost:8502/api/vic-issuances")
     print("💳 Transactions: http://localhost:8502/api/transactions")
     print("=" * 50)
@@ -0,0 +1,144 @@
+"""
+In-process pub/sub untuk ledger events
+
+Publishers (issuance pipeline, block producer) may run in any thread; each
+subscriber is an asyncio queue bound to the event loop that created it.
+Every event gets a monotonically increasing `seq`, and the last
+EVENT_BUFFER_SIZE events are kept so subscribers can resume from a sequence
+number.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "10000"))
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+class Subscription:
+    """Queue of events matching a predicate, consumed from one event loop"""
+
+    def __init__(self, bus, predicate, loop):
+        self.bus = bus
+        self.predicate = predicate
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _put(self, event):
+        if self.queue.full():
+            # Slow consumer: stop delivering instead of growing without bound
+            self.overflowed = True
+            self.bus.unsubscribe(self)
+            return
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        if self.predicate is not None and not self.predicate(event):
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Event loop already closed
+            self.bus.unsubscribe(self)
+
+    async def get(self, timeout=None):
+        """Next matching event, or None on timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class EventBus:
+    def __init__(self, buffer_size=EVENT_BUFFER_SIZE):
+        # Sequence numbers restart with the process; clients compare stream_id to detect that
+        self.stream_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def publish(self, event_type, **fields):
+        """Publish an event to every matching subscriber; safe from any thread"""
+        with self._lock:
+            self._seq += 1
+            event = dict(fields, seq=self._seq, type=event_type, published_at=time.time())
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self, predicate=None, since=None):
+        """Subscribe from inside a running event loop; replays buffered events with seq > since"""
+        subscription = Subscription(self, predicate, asyncio.get_running_loop())
+        with self._lock:
+            # Replay and register under the lock so no event falls in between
+            if since is not None:
+                for event in self._buffer:
+                    if event['seq'] > since and (predicate is None or predicate(event)):
+                        subscription.queue.put_nowait(event)
+                        if subscription.queue.full():
+                            break
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def events_since(self, since=0, predicate=None, limit=500):
+        """(events with seq > since, complete, last_seq); `complete` is False when older events were
+        already evicted, and last_seq is the resume point taken under the same lock as the events"""
+        with self._lock:
+            oldest = self._buffer[0]['seq'] if self._buffer else self._seq + 1
+            last_seq = self._seq
+            events = [event for event in self._buffer
+                      if event['seq'] > since and (predicate is None or predicate(event))]
+        if len(events) > limit:
+            events = events[:limit]
+            last_seq = events[-1]['seq']
+        return events, since + 1 >= oldest, last_seq
+
+    def oldest_seq(self):
+        """Oldest sequence number still replayable (None when the buffer is empty)"""
+        with self._lock:
+            return self._buffer[0]['seq'] if self._buffer else None
+
+def event_matcher(event_types=None, transaction_hash=None, patient_id=None, hospital=None):
+    """Predicate on event type and optional transaction hash / patient id / hospital"""
+    def predicate(event):
+        if event_types is not None and event['type'] not in event_types:
+            return False
+        if transaction_hash is not None and event.get('transaction_hash') != transaction_hash:
+            return False
+        if patient_id is not None and event.get('patient_id') != patient_id:
+            return False
+        if hospital is not None and hospital not in (event.get('hospital'), event.get('shared_with_hospital')):
+            return False
+        return True
+    return predicate
+
+def format_sse(event):
+    """Server-sent event frame; events without a seq (not from the bus) carry no id"""
+    event_id = f"id: {event['seq']}\n" if 'seq' in event else ""
+    return f"{event_id}event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+SSE_HEARTBEAT = ": keep-alive\n\n"
+
+def parse_event_types(types):
+    """Comma-separated event types from a query string (None for all)"""
+    return {t.strip() for t in types.split(',') if t.strip()} if types else None
+
+# Shared bus for this process
+event_bus = EventBus()
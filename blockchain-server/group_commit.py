@@ -0,0 +1,115 @@
+"""
+Group commit untuk ledger writes
+
+Callers hand over rows and block until they are durable, but rows arriving
+within GROUP_COMMIT_MAX_DELAY_MS of each other share one DB transaction (at
+most GROUP_COMMIT_MAX_BATCH writes), so MariaDB pays one fsync per batch
+instead of one per VIC. Every caller is acknowledged only after the shared
+commit; if the batch fails, each write is retried on its own so only the
+offending caller sees the error.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+from database import SessionLocal, transaction_rows, vic_issuance_from_data
+
+GROUP_COMMIT_MAX_DELAY = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "2")) / 1000
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "256"))
+
+class GroupCommitter:
+    """Background thread committing queued writes in batches"""
+
+    def __init__(self, session_factory=SessionLocal, max_delay=GROUP_COMMIT_MAX_DELAY, max_batch=GROUP_COMMIT_MAX_BATCH):
+        self.session_factory = session_factory
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.commits = 0
+        self.writes = 0
+        self._pending = []
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def write(self, *rows):
+        """Queue rows to be inserted together; the future resolves to the rows after commit"""
+        future = Future()
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Group committer stopped")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+            self._pending.append((rows, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._condition.notify()
+        return future
+
+    def save_transaction(self, transaction_data, *extra_rows):
+        """Group-committed equivalent of database.save_transaction"""
+        return self.write(*transaction_rows(transaction_data), *extra_rows).result()[0]
+
+    def save_vic_issuance(self, vic_data):
+        """Group-committed equivalent of database.save_vic_issuance"""
+        return self.write(vic_issuance_from_data(vic_data)).result()[0]
+
+    def stop(self):
+        """Commit what is queued and stop the thread"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # Give concurrent writers a moment to join this batch
+                deadline = time.monotonic() + self.max_delay
+                while len(self._pending) < self.max_batch and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._commit(batch)
+
+    def _commit_rows(self, units):
+        # Keep attributes loaded after commit; callers read them from another thread
+        db = self.session_factory(expire_on_commit=False)
+        try:
+            for rows, _ in units:
+                db.add_all(rows)
+            db.commit()
+            self.commits += 1
+            self.writes += len(units)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _commit(self, batch):
+        try:
+            self._commit_rows(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            for unit in batch:
+                for row in unit[0]:
+                    row.id = None  # Rolled-back rows keep the ids assigned by the failed flush
+                try:
+                    self._commit_rows([unit])
+                except Exception as unit_error:
+                    unit[1].set_exception(unit_error)
+                else:
+                    unit[1].set_result(list(unit[0]))
+            return
+        for rows, future in batch:
+            future.set_result(list(rows))
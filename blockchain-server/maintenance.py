@@ -0,0 +1,131 @@
+"""
+Background ledger maintenance
+
+One daemon thread runs periodic housekeeping that should not sit on a
+request path, each task on its own interval: marking shares past expires_at
+as expired in bulk (so listings read live shares straight from the status
+index), folding new rows into the analytics aggregates (on a timer, and soon
+after a write asks for it via request()), keeping monthly vic_access_logs
+partitions ahead of the clock on MariaDB, and pruning raw share access logs
+older than ACCESS_LOG_RETENTION_DAYS once they are folded into the daily
+rollups.
+
+Partitioning an existing vic_access_logs table rewrites it, so that is an
+explicit step rather than part of startup; run it (or any task once) with
+`python maintenance.py partition-access-logs` / `python maintenance.py <task>`.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from database import (
+    engine, SessionLocal, ACCESS_LOG_PARTITIONED, ensure_access_log_partitions, prune_vic_access_logs, expire_vic_shares,
+    refresh_analytics_aggregates
+)
+
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "3600"))  # Seconds between access log runs
+SHARE_EXPIRY_INTERVAL = float(os.getenv("SHARE_EXPIRY_INTERVAL", "60"))  # Seconds between expiry sweeps
+ANALYTICS_REFRESH_INTERVAL = float(os.getenv("ANALYTICS_REFRESH_INTERVAL", "300"))  # Seconds between analytics folds
+
+def add_access_log_partitions(db):
+    """New monthly partitions before the current ones run out (MariaDB only)"""
+    if not ACCESS_LOG_PARTITIONED or db.get_bind().dialect.name not in ("mysql", "mariadb"):
+        return 0
+    added = ensure_access_log_partitions(db.connection())
+    db.commit()
+    return added
+
+def partition_access_logs():
+    """Partition vic_access_logs by month (MariaDB only); rewrites the table, so it runs only on request"""
+    if engine.dialect.name not in ("mysql", "mariadb"):
+        raise SystemExit("partition-access-logs needs MariaDB (DATABASE_URL)")
+    with engine.begin() as connection:
+        return ensure_access_log_partitions(connection, initial=True)
+
+class MaintenanceWorker(threading.Thread):
+    """Background thread running each maintenance task on its own interval"""
+
+    def __init__(self, interval=MAINTENANCE_INTERVAL, expiry_interval=SHARE_EXPIRY_INTERVAL,
+                 analytics_interval=ANALYTICS_REFRESH_INTERVAL, session_factory=SessionLocal):
+        super().__init__(name="maintenance", daemon=True)
+        self.session_factory = session_factory
+        self.tasks = [  # (name, task, seconds between runs)
+            ('share_expiry', expire_vic_shares, expiry_interval),
+            ('analytics', refresh_analytics_aggregates, analytics_interval),
+            ('access_log_partitions', add_access_log_partitions, interval),
+            ('access_log_retention', prune_vic_access_logs, interval),
+        ]
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._requested = {}  # name -> [earliest, latest] requested run time
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def request(self, name, delay=0.0):
+        """Run a task in `delay` seconds, off the caller's thread
+
+        Pending requests coalesce: the task runs at the earliest requested time and,
+        if later requests are still ahead, once more at the latest one.
+        """
+        at = time.monotonic() + delay
+        with self._lock:
+            pending = self._requested.setdefault(name, [at, at])
+            pending[0], pending[1] = min(pending[0], at), max(pending[1], at)
+        self._wake.set()
+
+    def run_once(self, names=None):
+        """Run every task (or the named ones) once; returns {task name: result}, None for a failed task"""
+        results = {}
+        for name, task, _ in self.tasks:
+            if names is not None and name not in names:
+                continue
+            db = self.session_factory()
+            try:
+                results[name] = task(db)
+            except Exception as e:
+                db.rollback()
+                results[name] = None
+                print(f"Maintenance task {name} failed: {e}")
+            finally:
+                db.close()
+        return results
+
+    def run(self):
+        due = {name: 0.0 for name, _, _ in self.tasks}
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            with self._lock:
+                requested = {name for name, (earliest, _) in self._requested.items() if earliest <= now}
+                for name in requested:
+                    latest = self._requested.pop(name)[1]
+                    if latest > now:
+                        self._requested[name] = [latest, latest]
+            names = {name for name, _, _ in self.tasks if due[name] <= now} | requested
+            self.run_once(names)
+            for name, _, interval in self.tasks:
+                if name in names:
+                    due[name] = now + interval
+            with self._lock:
+                next_run = min([*due.values(), *(earliest for earliest, _ in self._requested.values())])
+            self._wake.wait(max(next_run - time.monotonic(), 0))
+            self._wake.clear()
+
+def main():
+    worker = MaintenanceWorker()
+    parser = argparse.ArgumentParser(description="Run a ledger maintenance step once")
+    parser.add_argument("task", choices=["partition-access-logs", *(name for name, _, _ in worker.tasks)])
+    args = parser.parse_args()
+    if args.task == "partition-access-logs":
+        print(f"vic_access_logs: {partition_access_logs()} partitions added")
+        return
+    result = worker.run_once({args.task})[args.task]
+    if result is None:
+        sys.exit(1)
+    print(f"{args.task}: {result}")
+
+if __name__ == "__main__":
+    main()
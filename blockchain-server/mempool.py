@@ -0,0 +1,289 @@
+"""
+Mempool dan block producer
+
+Pending transactions are `transactions` rows with block_id NULL, so the
+mempool is durable and shared by every process. A background BlockProducer
+seals them into blocks when either BLOCK_MAX_TRANSACTIONS are waiting or the
+oldest one has waited BLOCK_TARGET_INTERVAL seconds.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from database import (
+    SessionLocal, Block, Transaction, VICIssuance, IdempotencyKey, save_transaction,
+    get_transaction_hash_by_idempotency_key, transaction_medical_data,
+    vic_issuance_from_data
+)
+
+BLOCK_MAX_TRANSACTIONS = int(os.getenv("BLOCK_MAX_TRANSACTIONS", "100"))
+BLOCK_TARGET_INTERVAL = float(os.getenv("BLOCK_TARGET_INTERVAL", "2.0"))
+BLOCK_APPEND_RETRIES = 5  # Attempts when another sealer takes the same block height
+
+REQUIRED_VIC_FIELDS = ('patient_name', 'diagnosis', 'treatment', 'doctor', 'date')
+
+IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", "600"))
+IDEMPOTENCY_CACHE_SIZE = 10000
+
+def vic_issuance_from_transaction(tx, block_number, medical_data=None):
+    """Build the vic_issuances row for a sealed vic_issuance transaction
+
+    medical_data is the decoded payload when the caller already has it (rows not loaded from the database).
+    """
+    if medical_data is None:
+        medical_data = transaction_medical_data(tx)
+    medical_data = medical_data or {}
+    if not all(medical_data.get(field) is not None for field in REQUIRED_VIC_FIELDS):
+        return None
+    return vic_issuance_from_data(dict(
+        medical_data,
+        transaction_hash=tx.transaction_hash,
+        block_number=block_number,
+        hospital=tx.hospital,
+        patient_id=tx.patient_id,
+        timestamp=tx.timestamp
+    ), payload_hash=tx.payload_hash)
+
+def block_hash_for(index, timestamp, previous_hash, transaction_hashes):
+    payload = f"{index}{timestamp}{previous_hash}{','.join(transaction_hashes)}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _append_block(db, pending):
+    """Append one block holding `pending` on the current tip; None if the rows were taken meanwhile"""
+    tip = db.query(Block).order_by(Block.index.desc()).first()
+    timestamp = time.time()
+    index = tip.index + 1 if tip else 1
+    previous_hash = tip.hash if tip else "0"
+    block = Block(
+        index=index,
+        timestamp=timestamp,
+        previous_hash=previous_hash,
+        hash=block_hash_for(index, timestamp, previous_hash, [tx.transaction_hash for tx in pending]),
+        nonce=0
+    )
+    db.add(block)
+    db.flush()  # IntegrityError here: another sealer already appended this height
+
+    # Only claim rows that are still pending; another sealer may have taken them
+    ids = [tx.id for tx in pending]
+    claimed = db.query(Transaction).filter(
+        Transaction.id.in_(ids),
+        Transaction.block_id.is_(None)
+    ).update({Transaction.block_id: block.id}, synchronize_session=False)
+    if claimed != len(ids):
+        db.rollback()
+        return None
+
+    for tx in pending:
+        if tx.transaction_type == 'vic_issuance':
+            vic = vic_issuance_from_transaction(tx, index)
+            if vic is not None:
+                db.add(vic)
+    # Plain summary taken before commit expires the ORM objects
+    summary = {
+        'block_id': block.id,
+        'block_number': index,
+        'hash': block.hash,
+        'previous_hash': previous_hash,
+        'timestamp': timestamp,
+        'transactions': [{
+            'transaction_hash': tx.transaction_hash,
+            'transaction_type': tx.transaction_type,
+            'hospital': tx.hospital,
+            'patient_id': tx.patient_id
+        } for tx in pending]
+    }
+    db.commit()
+    return summary
+
+def seal_block(db, max_transactions=BLOCK_MAX_TRANSACTIONS):
+    """Seal up to max_transactions pending transactions into one block; returns a block summary or None"""
+    for _ in range(BLOCK_APPEND_RETRIES):
+        pending = db.query(Transaction).filter(Transaction.block_id.is_(None)).order_by(Transaction.id.asc()).limit(max_transactions).all()
+        if not pending:
+            return None
+        try:
+            summary = _append_block(db, pending)
+        except IntegrityError:
+            # Lost the race for this block height; rebuild on the new tip
+            db.rollback()
+            continue
+        if summary is not None:
+            return summary
+    return None
+
+def chain_integrity_errors(db):
+    """Gaps, forks and unsealed/mismatched rows in the stored chain (empty list when consistent)"""
+    errors = []
+    previous = None
+    for block in db.query(Block.id, Block.index, Block.hash, Block.previous_hash).order_by(Block.index.asc(), Block.id.asc()):
+        expected_index = previous.index + 1 if previous else 1
+        if block.index != expected_index:
+            errors.append(f"block {block.id}: index {block.index}, expected {expected_index}")
+        expected_previous = previous.hash if previous else "0"
+        if block.previous_hash != expected_previous:
+            errors.append(f"block {block.index}: previous_hash does not match block {expected_index - 1}")
+        previous = block
+    mismatched = db.query(func.count(VICIssuance.id)).join(
+        Transaction, Transaction.transaction_hash == VICIssuance.transaction_hash
+    ).join(Block, Block.id == Transaction.block_id).filter(Block.index != VICIssuance.block_number).scalar()
+    if mismatched:
+        errors.append(f"{mismatched} VIC issuances with a block_number different from their block")
+    return errors
+
+def get_transaction_status(db, transaction_hash):
+    """pending / confirmed / unknown, with the block number once confirmed"""
+    row = db.query(Transaction.block_id).filter(Transaction.transaction_hash == transaction_hash).first()
+    if row is None:
+        return {'transaction_hash': transaction_hash, 'status': 'unknown', 'block_number': None}
+    if row.block_id is None:
+        return {'transaction_hash': transaction_hash, 'status': 'pending', 'block_number': None}
+    index = db.query(Block.index).filter(Block.id == row.block_id).scalar()
+    return {'transaction_hash': transaction_hash, 'status': 'confirmed', 'block_number': index}
+
+class IdempotencyCache:
+    """Short-lived key -> transaction hash map so retries skip the database lookup"""
+
+    def __init__(self, ttl=IDEMPOTENCY_CACHE_TTL, max_size=IDEMPOTENCY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            transaction_hash, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return transaction_hash
+
+    def put(self, key, transaction_hash):
+        with self._lock:
+            self._entries[key] = (transaction_hash, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+class Mempool:
+    """Submit pending transactions and wake the block producer"""
+
+    def __init__(self, max_transactions=BLOCK_MAX_TRANSACTIONS, committer=None):
+        self.max_transactions = max_transactions
+        self.committer = committer  # Optional GroupCommitter shared by concurrent submitters
+        self._condition = threading.Condition()
+        self._submitted_since_wake = 0
+        self.recent_keys = IdempotencyCache()
+
+    def submit(self, db, transaction_data, *extra_rows):
+        """Persist a pending transaction (block_id NULL) and wake the producer if a block is full
+
+        extra_rows are inserted in the same DB transaction.
+        """
+        transaction_data = dict(transaction_data, block_id=None)
+        if self.committer is not None:
+            transaction = self.committer.save_transaction(transaction_data, *extra_rows)
+        else:
+            db.add_all(extra_rows)
+            transaction = save_transaction(db, transaction_data)
+        with self._condition:
+            self._submitted_since_wake += 1
+            if self._submitted_since_wake >= self.max_transactions:
+                self._condition.notify_all()
+        return transaction
+
+    def known_transaction_hash(self, db, idempotency_key):
+        """Transaction hash already recorded for a key (cache first, then database)"""
+        existing = self.recent_keys.get(idempotency_key) or get_transaction_hash_by_idempotency_key(db, idempotency_key)
+        if existing:
+            self.recent_keys.put(idempotency_key, existing)
+        return existing
+
+    def submit_once(self, db, transaction_data, idempotency_key):
+        """Submit unless the key was already used; returns (transaction_hash, created)"""
+        existing = self.known_transaction_hash(db, idempotency_key)
+        if existing:
+            return existing, False
+        # The key row is committed together with the transaction, so the unique index settles races
+        key_row = IdempotencyKey(key=idempotency_key, transaction_hash=transaction_data['transaction_hash'])
+        try:
+            self.submit(db, transaction_data, key_row)
+        except IntegrityError:
+            db.rollback()
+            existing = self.known_transaction_hash(db, idempotency_key)
+            if existing is None:
+                raise
+            return existing, False
+        self.recent_keys.put(idempotency_key, transaction_data['transaction_hash'])
+        return transaction_data['transaction_hash'], True
+
+    def wait_for_work(self, timeout):
+        """Block until a full block was submitted in this process or timeout passes"""
+        with self._condition:
+            if self._submitted_since_wake < self.max_transactions:
+                self._condition.wait(timeout)
+            self._submitted_since_wake = 0
+
+    def wake(self):
+        """Wake the producer (used on shutdown)"""
+        with self._condition:
+            self._condition.notify_all()
+
+class BlockProducer(threading.Thread):
+    """Background thread sealing pending transactions by size or time interval"""
+
+    def __init__(self, mempool, max_transactions=BLOCK_MAX_TRANSACTIONS, interval=BLOCK_TARGET_INTERVAL,
+                 session_factory=SessionLocal):
+        super().__init__(name="block-producer", daemon=True)
+        self.mempool = mempool
+        self.max_transactions = max_transactions
+        self.interval = interval
+        self.session_factory = session_factory
+        self.listeners = []  # Called with the block summary after each sealed block
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.mempool.wake()
+
+    def _block_due(self, db):
+        """A block is due when it would be full or the oldest pending transaction is old enough"""
+        count, oldest = db.query(
+            func.count(Transaction.id), func.min(Transaction.timestamp)
+        ).filter(Transaction.block_id.is_(None)).one()
+        if not count:
+            return False
+        return count >= self.max_transactions or time.time() - oldest >= self.interval
+
+    def produce_once(self):
+        """Seal every block that is due; returns the number of blocks sealed"""
+        sealed = 0
+        db = self.session_factory()
+        try:
+            while self._block_due(db):
+                result = seal_block(db, self.max_transactions)
+                if result is None:
+                    break
+                sealed += 1
+                for listener in self.listeners:
+                    try:
+                        listener(result)
+                    except Exception as e:
+                        print(f"Block listener error: {e}")
+        except Exception as e:
+            db.rollback()
+            print(f"Block producer error: {e}")
+        finally:
+            db.close()
+        return sealed
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.produce_once()
+            self.mempool.wait_for_work(self.interval / 4)
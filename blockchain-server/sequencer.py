@@ -0,0 +1,189 @@
+"""
+Single-writer block sequencer
+
+One asyncio task owns the chain tip of this process. Issuance requests arrive
+on a bounded queue; the task takes everything waiting (up to
+SEQUENCER_MAX_BATCH), writes the transactions, their VIC rows and one block
+in a single DB transaction, and resolves each request's future with the
+block summary. Requests arriving during a commit form the next batch, so
+throughput grows with load instead of being capped at one commit per VIC.
+
+Other processes may still append blocks (block producer, other workers); the
+unique block height makes such a race fail, and the sequencer retries on the
+new tip.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal, Block, IdempotencyKey, transaction_rows, decode_medical_data
+from mempool import (
+    vic_issuance_from_transaction, block_hash_for, BLOCK_MAX_TRANSACTIONS, BLOCK_APPEND_RETRIES
+)
+
+SEQUENCER_QUEUE_SIZE = int(os.getenv("SEQUENCER_QUEUE_SIZE", "10000"))
+SEQUENCER_MAX_BATCH = int(os.getenv("SEQUENCER_MAX_BATCH", str(BLOCK_MAX_TRANSACTIONS)))
+SEQUENCER_SUBMIT_TIMEOUT = float(os.getenv("SEQUENCER_SUBMIT_TIMEOUT", "1.0"))
+
+class SequencerBusy(Exception):
+    """The sequencer queue stayed full for the whole submit timeout"""
+
+class BlockSequencer:
+    """Assign block numbers in one task and group-commit queued issuances"""
+
+    def __init__(self, session_factory=SessionLocal, max_batch=SEQUENCER_MAX_BATCH,
+                 queue_size=SEQUENCER_QUEUE_SIZE, submit_timeout=SEQUENCER_SUBMIT_TIMEOUT):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self.submit_timeout = submit_timeout
+        self.listeners = []  # Called with the block summary after each commit
+        self._queue = None
+        self._task = None
+        self._tip = None  # (index, hash) of the last block this sequencer knows about
+        self._batch = None  # Batch whose commit is in flight
+        self._stopping = False
+        # DB work runs on one thread so the event loop never blocks on a commit
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sequencer")
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the writer task on the running event loop"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Let the batch in flight commit and resolve, then fail whatever is still queued"""
+        self._stopping = True
+        if self._task is not None:
+            if self._batch is None:
+                self._task.cancel()  # Idle on the queue; nothing to finish
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(SequencerBusy("Sequencer stopped"))
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, transaction_data, idempotency_key=None):
+        """Queue a transaction and wait until its block is committed; returns the block summary"""
+        if self._stopping:
+            raise SequencerBusy("Sequencer stopped")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((transaction_data, idempotency_key, future)), self.submit_timeout)
+        except asyncio.TimeoutError:
+            raise SequencerBusy(f"Sequencer queue full ({self.queue_size} waiting)")
+        if self._stopping and not self.running:
+            raise SequencerBusy("Sequencer stopped")  # Queued after stop() drained the queue
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._batch = batch
+            items = [(transaction_data, idempotency_key) for transaction_data, idempotency_key, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self._commit_batch, items)
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if future.done():
+                    continue  # Caller went away; the write itself still stands
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            for summary in {id(r): r for r in results if not isinstance(r, Exception)}.values():
+                for listener in self.listeners:
+                    try:
+                        listener(summary)
+                    except Exception as e:
+                        print(f"Sequencer listener error: {e}")
+            self._batch = None
+
+    def _commit_batch(self, items):
+        """Write all items as one block; on a bad item fall back to one block per item"""
+        try:
+            summary = self._write_block(items)
+            return [summary] * len(items)
+        except IntegrityError:
+            if len(items) == 1:
+                raise
+        results = []
+        for item in items:
+            try:
+                results.append(self._write_block([item]))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _load_tip(self, db):
+        tip = db.query(Block.index, Block.hash).order_by(Block.index.desc()).first()
+        return (tip.index, tip.hash) if tip else (0, "0")
+
+    def _write_block(self, items):
+        """One DB transaction: transactions, VIC rows, idempotency keys and the block header"""
+        db = self.session_factory()
+        try:
+            for _ in range(BLOCK_APPEND_RETRIES):
+                if self._tip is None:
+                    self._tip = self._load_tip(db)
+                tip_index, tip_hash = self._tip
+                index = tip_index + 1
+                timestamp = time.time()
+                block_hash = block_hash_for(index, timestamp, tip_hash, [data['transaction_hash'] for data, _ in items])
+                block = Block(index=index, timestamp=timestamp, previous_hash=tip_hash, hash=block_hash, nonce=0)
+                try:
+                    db.add(block)
+                    db.flush()
+                    transactions = []
+                    for data, idempotency_key in items:
+                        rows = transaction_rows(dict(data, block_id=block.id))
+                        db.add_all(rows)
+                        tx = rows[0]
+                        transactions.append(tx)
+                        if idempotency_key:
+                            db.add(IdempotencyKey(key=idempotency_key, transaction_hash=data['transaction_hash']))
+                        if tx.transaction_type == 'vic_issuance':
+                            vic = vic_issuance_from_transaction(tx, index, decode_medical_data(data.get('medical_data')))
+                            if vic is not None:
+                                db.add(vic)
+                    summary = {
+                        'block_id': block.id,
+                        'block_number': index,
+                        'hash': block_hash,
+                        'previous_hash': tip_hash,
+                        'timestamp': timestamp,
+                        'transactions': [{
+                            'transaction_hash': tx.transaction_hash,
+                            'transaction_type': tx.transaction_type,
+                            'hospital': tx.hospital,
+                            'patient_id': tx.patient_id
+                        } for tx in transactions]
+                    }
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    current = self._load_tip(db)
+                    if current[0] < index:
+                        raise  # Not a height race: one of the rows is a duplicate
+                    # Someone else appended this height; continue from their tip
+                    self._tip = current
+                    continue
+                self._tip = (index, block_hash)
+                return summary
+            raise IntegrityError("block append", None, Exception("lost the block height race too many times"))
+        finally:
+            db.close()
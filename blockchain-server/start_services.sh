@@ -7,7 +7,7 @@ echo "🚀 Starting DID Blockchain Server Services..."
 echo "🔄 Stopping existing services..."
 pkill -f "streamlit.*8501" 2>/dev/null || true
 pkill -f "python.*api_server" 2>/dev/null || true
-pkill -f "python.*flask_api" 2>/dev/null || true
+pkill -f "python.*verify_server" 2>/dev/null || true
 
 # Wait a moment for processes to stop
 sleep 2
@@ -23,18 +23,28 @@ if lsof -Pi :8502 -sTCP:LISTEN -t >/dev/null ; then
     exit 1
 fi
 
+if lsof -Pi :8505 -sTCP:LISTEN -t >/dev/null ; then
+    echo "❌ Port 8505 is still in use"
+    exit 1
+fi
+
 # Start API server in background
 echo "🔗 Starting API Server on port 8502..."
 cd /root/did-uts-new/blockchain-server
 nohup python3 api_server.py > api_server.log 2>&1 &
 API_PID=$!
 
+# Start verify service (standalone, not tied to Streamlit reruns)
+echo "🔍 Starting Verify Service on port 8505..."
+VERIFY_PORT=8505 nohup python3 verify_server.py > verify_service.log 2>&1 &
+VERIFY_PID=$!
+
 # Wait for API server to start
 sleep 3
 
 # Start Streamlit in background
 echo "🌐 Starting Streamlit UI on port 8501..."
-nohup streamlit run app.py --server.port=8501 --server.address=0.0.0.0 --server.headless=true > streamlit.log 2>&1 &
+VERIFY_API_URL=http://localhost:8505 API_SERVER_URL=http://localhost:8502 nohup streamlit run app.py --server.port=8501 --server.address=0.0.0.0 --server.headless=true > streamlit.log 2>&1 &
 STREAMLIT_PID=$!
 
 # Wait for services to start
@@ -50,6 +60,13 @@ else
     echo "❌ API Server: Failed to start"
 fi
 
+# Check verify service
+if curl -s http://localhost:8505/health > /dev/null; then
+    echo "✅ Verify Service: Running"
+else
+    echo "❌ Verify Service: Failed to start"
+fi
+
 # Check Streamlit
 if curl -s http://localhost:8501/ > /dev/null; then
     echo "✅ Streamlit UI: Running"
@@ -61,14 +78,16 @@ echo ""
 echo "📋 Service Information:"
 echo "🔗 API Server: http://localhost:8502"
 echo "🌐 Streamlit UI: http://localhost:8501"
+echo "🔍 Verify Service: http://localhost:8505/verify/<transaction_hash>"
 echo "📊 VIC Issuances: http://localhost:8502/api/vic-issuances"
 echo "💳 Transactions: http://localhost:8502/api/transactions"
 echo ""
 echo "📝 Logs:"
 echo "   API Server: api_server.log"
 echo "   Streamlit: streamlit.log"
+echo "   Verify Service: verify_service.log"
 echo ""
 echo "🛑 To stop services:"
-echo "   kill $API_PID $STREAMLIT_PID"
+echo "   kill $API_PID $VERIFY_PID $STREAMLIT_PID"
 echo ""
 echo "✅ Services started successfully!"
@@ -0,0 +1,54 @@
+"""
+Standalone verify service (ASGI, multi-worker)
+
+Usage:
+    python verify_server.py
+
+Configured from env: VERIFY_HOST, VERIFY_PORT, VERIFY_WORKERS,
+VERIFY_KEEPALIVE (seconds), VERIFY_BACKLOG.
+"""
+from fastapi import FastAPI, Depends
+from fastapi.middleware.cors import CORSMiddleware
+import multiprocessing
+import os
+from sqlalchemy.orm import Session
+from database import get_read_db
+from verify_service import verify_transaction, health_check
+
+app = FastAPI()
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Handlers are sync so blocking DB calls run in the threadpool, not on the event loop
+@app.get("/verify/{transaction_hash}")
+def verify_vic(transaction_hash: str, db: Session = Depends(get_read_db)):
+    """Verify VIC using transaction hash"""
+    return verify_transaction(db, transaction_hash)
+
+@app.get("/health")
+def health(db: Session = Depends(get_read_db)):
+    """Health check endpoint"""
+    return health_check(db)
+
+def server_config():
+    """uvicorn settings from env"""
+    return {
+        "host": os.getenv("VERIFY_HOST", "0.0.0.0"),
+        "port": int(os.getenv("VERIFY_PORT", "8501")),
+        "workers": int(os.getenv("VERIFY_WORKERS", multiprocessing.cpu_count())),
+        "timeout_keep_alive": int(os.getenv("VERIFY_KEEPALIVE", "5")),
+        "backlog": int(os.getenv("VERIFY_BACKLOG", "2048")),
+        "access_log": os.getenv("VERIFY_ACCESS_LOG", "false").lower() == "true"
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+    # Import string (not the app object) so uvicorn can spawn worker processes
+    uvicorn.run("verify_server:app", **server_config())
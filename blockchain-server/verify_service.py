@@ -0,0 +1,76 @@
+"""
+Shared VIC verify service layer
+
+Single verify implementation behind every HTTP front end
+(api_server.py and verify_server.py).
+"""
+from datetime import datetime
+from database import get_vic_issuance_row, get_ledger_counts
+from block_index import block_index
+
+def vic_to_dict(vic):
+    """Public VIC fields returned by verify"""
+    return {
+        "transaction_hash": vic.transaction_hash,
+        "block_number": vic.block_number,
+        "hospital": vic.hospital,
+        "patient_id": vic.patient_id,
+        "patient_name": vic.patient_name,
+        "diagnosis": vic.diagnosis,
+        "treatment": vic.treatment,
+        "doctor": vic.doctor,
+        "date": vic.date,
+        "notes": vic.notes,
+        "timestamp": vic.timestamp
+    }
+
+def verify_transaction(db, transaction_hash):
+    """Verify VIC using transaction hash"""
+    try:
+        vic = get_vic_issuance_row(db, transaction_hash)
+        
+        if vic:
+            result = {
+                "verified": True,
+                "message": "VIC verified successfully",
+                "data": vic_to_dict(vic)
+            }
+            if block_index is not None:
+                # Header sliced from the shared mmap index, no extra query
+                result["block"] = block_index.header(vic.block_number)
+            return result
+        
+        return {
+            "verified": False,
+            "message": "VIC not found in blockchain",
+            "data": None
+        }
+        
+    except Exception as e:
+        return {
+            "verified": False,
+            "message": f"Verification error: {str(e)}",
+            "data": None
+        }
+
+def health_check(db):
+    """Health check with ledger statistics"""
+    try:
+        counts = get_ledger_counts(db)
+        
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "timestamp": datetime.now().isoformat(),
+            "statistics": {
+                "total_vic_issuances": counts['vic_issuances'],
+                "total_transactions": counts['transactions'],
+                "total_blocks": counts['blocks']
+            }
+        }
+    except Exception as e:
+        return {
+            "status": "unhealthy",
+            "database": "disconnected",
+            "error": str(e)
+        }
@@ -6,6 +6,7 @@ from io import BytesIO
 import base64
 from datetime import datetime
 import time
+import uuid
 
 # Configuration
 API_BASE_URL = "http://did-api-server:8502"
@@ -112,14 +113,15 @@ def generate_qr_code(data):
     
     return img_bytes
 
-def try_api_endpoints(request_data):
-    """Try API endpoints with fallback"""
+def try_api_endpoints(request_data, idempotency_key=None):
+    """Try API endpoints with fallback; every attempt reuses one Idempotency-Key"""
+    idempotency_key = idempotency_key or uuid.uuid4().hex
     for endpoint in API_ENDPOINTS:
         try:
             response = requests.post(
                 endpoint,
                 json=request_data,
-                headers={'Content-Type': 'application/json'},
+                headers={'Content-Type': 'application/json', 'Idempotency-Key': idempotency_key},
                 timeout=10
             )
             
@@ -138,6 +140,52 @@ def try_api_endpoints(request_data):
     
     return None, False
 
+def await_confirmation(result, timeout=15):
+    """Wait for a pending issuance to be sealed into a block"""
+    if result.get('status') != 'pending':
+        return result
+    try:
+        response = requests.get(
+            f"{API_BASE_URL}/api/confirmations/wait",
+            params={"transaction_hash": result['transactionHash'], "timeout": timeout},
+            timeout=timeout + 5
+        )
+        if response.ok:
+            status = response.json()
+            if status.get('confirmed'):
+                result = dict(result, status='confirmed', blockNumber=status['event'].get('block_number'))
+    except requests.exceptions.RequestException:
+        pass
+    return result
+
+def fetch_hospital_events():
+    """Fetch events involving this hospital that arrived since the last rerun"""
+    state = st.session_state
+    if 'activity_events' not in state:
+        state.activity_events = []
+        state.activity_seq = 0
+        state.activity_stream_id = None
+    try:
+        response = requests.get(
+            f"{API_BASE_URL}/api/events",
+            params={"since": state.activity_seq, "hospital": HOSPITAL_NAME},
+            timeout=5
+        )
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        return state.activity_events
+    
+    if data.get('stream_id') != state.activity_stream_id:
+        # API server restarted: sequence numbers start over
+        state.activity_events = []
+        state.activity_stream_id = data.get('stream_id')
+        if state.activity_seq:
+            state.activity_seq = 0
+            return fetch_hospital_events()
+    state.activity_events = (state.activity_events + data.get('events', []))[-10:]
+    state.activity_seq = data.get('last_seq', state.activity_seq)
+    return state.activity_events
+
 def main():
     # Header
     st.markdown(f"""
@@ -173,6 +221,15 @@ def issue_vic_page():
         st.header("🔧 API Status")
         for i, endpoint in enumerate(API_ENDPOINTS, 1):
             st.write(f"API {i}: {endpoint}")
+        
+        st.header("📡 Live Activity")
+        activity = fetch_hospital_events()
+        if activity:
+            for event in reversed(activity):
+                label = event.get('transaction_hash') or event.get('share_token') or ''
+                st.caption(f"{datetime.fromtimestamp(event['published_at']).strftime('%H:%M:%S')} · {event['type']} · {label[:18]}")
+        else:
+            st.caption("No recent activity")
     
     # Main form
     with st.form("vic_form"):
@@ -254,6 +311,7 @@ def issue_vic_page():
                 result, success = try_api_endpoints(request_data)
                 
                 if success:
+                    result = await_confirmation(result)
                     show_notification("VIC berhasil diterbitkan!", "success")
                     st.session_state.total_issued += 1
                     
@@ -265,7 +323,7 @@ def issue_vic_page():
                     with col1:
                         st.subheader("📄 Transaction Details")
                         st.code(f"Transaction Hash: {result.get('transactionHash', 'N/A')}")
-                        st.code(f"Block Number: {result.get('blockNumber', 'N/A')}")
+                        st.code(f"Block Number: {result.get('blockNumber') or 'Pending'}")
                         st.code(f"Patient ID: {patient_id}")
                     
                     with col2:
@@ -284,7 +342,7 @@ def issue_vic_page():
                             "transaction_hash": result.get('transactionHash', ''),
                             "block_number": result.get('blockNumber', ''),
                             "timestamp": datetime.now().isoformat(),
-                            "verification_url": f"http://31.97.108.98:8501/verify/{result.get('transactionHash', '')}"
+                            "verification_url": f"http://31.97.108.98:8505/verify/{result.get('transactionHash', '')}"
                         })
                         
                         qr_img = generate_qr_code(qr_data)
@@ -333,7 +391,7 @@ def issue_vic_page():
                             "block_number": demo_result['blockNumber'],
                             "timestamp": datetime.now().isoformat(),
                             "demo_mode": True,
-                            "verification_url": f"http://31.97.108.98:8501/verify/{demo_result['transactionHash']}"
+                            "verification_url": f"http://31.97.108.98:8505/verify/{demo_result['transactionHash']}"
                         })
                         
                         qr_img = generate_qr_code(qr_data)